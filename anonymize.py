@@ -0,0 +1,52 @@
+import math
+import cv2
+
+anonymize_modes = ("gaussian", "pixelate", "box", "fill")
+
+
+def odd(value):
+    value = max(1, int(value))
+    return value if value % 2 else value + 1
+
+
+class Anonymizer:
+    # Face privacy filters. blocks is the guaranteed strength: no mode keeps detail finer than
+    # face size / blocks, so at 8 a face carries at most about 8x8 independent samples.
+    def __init__(self, mode="gaussian", blocks=8, fill_color=(0, 0, 0)):
+        if mode not in anonymize_modes:
+            raise ValueError(f"Unknown anonymize mode: {mode}")
+        self.mode = mode
+        self.blocks = blocks
+        self.fill_color = fill_color
+
+    def scale(self, face):
+        # Smallest feature size (in pixels) that may survive for this face
+        return max(face.shape[0], face.shape[1]) / self.blocks
+
+    def apply(self, face):
+        if face.size == 0:
+            return face
+        return getattr(self, self.mode)(face)
+
+    def gaussian(self, face):
+        # Same (99, 99) / sigma 30 blur as before; widened only when the face is large enough to need it
+        sigma = max(30.0, self.scale(face) / 2)
+        ksize = 99 if sigma == 30.0 else odd(6 * sigma)
+        return cv2.GaussianBlur(face, (ksize, ksize), sigma)
+
+    def pixelate(self, face):
+        # Average down to blocks x blocks cells and scale back up without interpolation
+        height, width = face.shape[:2]
+        small = cv2.resize(face, (min(self.blocks, width), min(self.blocks, height)), interpolation=cv2.INTER_AREA)
+        return cv2.resize(small, (width, height), interpolation=cv2.INTER_NEAREST)
+
+    def box(self, face):
+        # Two separable box passes, each as wide as one block; cost does not depend on the kernel size
+        ksize = odd(math.ceil(self.scale(face)))
+        blurred = cv2.blur(face, (ksize, ksize), borderType=cv2.BORDER_REPLICATE)
+        return cv2.blur(blurred, (ksize, ksize), borderType=cv2.BORDER_REPLICATE)
+
+    def fill(self, face):
+        face = face.copy()
+        face[:] = self.fill_color
+        return face
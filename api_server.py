@@ -0,0 +1,318 @@
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs, unquote
+from capture_log import get_capture_log, LogView
+from capture_aggregates import get_capture_aggregates, last_days, parse_hours
+from thumbnail_cache import get_thumbnail_cache
+from profiling import get_profiler
+from capture_store import get_capture_store
+
+status_texts = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed"}
+# Host header names accepted besides the bind address; anything else may be a DNS-rebinding page
+loopback_hosts = {"localhost", "127.0.0.1", "::1"}
+
+
+class Subscriber:
+    # One event-stream client. Its queue is bounded: when the client falls behind the oldest
+    # messages are dropped, and a client that stops reading altogether is disconnected.
+    def __init__(self, event_types, max_pending=32):
+        self.event_types = event_types
+        self.max_pending = max_pending
+        self.messages = deque()
+        self.ready = asyncio.Event()
+        self.dropped = 0
+
+    def push(self, event, message):
+        if self.event_types and event not in self.event_types:
+            return
+        if len(self.messages) >= self.max_pending:
+            self.messages.popleft()
+            self.dropped += 1
+        self.messages.append(message)
+        self.ready.set()
+
+
+class ApiServer:
+    # Local HTTP API: Server-Sent Events for live detections and counts, JSON for log pages,
+    # JPEG thumbnails. Runs its own event loop; the pipeline only hands events over.
+    # No CORS header is sent unless allow_origin names the one origin (e.g. a dashboard) allowed to read responses.
+    def __init__(self, pipeline=None, host="127.0.0.1", port=8765, image_folder="captured_images", max_pending=32,
+                 aggregates_interval=2.0, heartbeat_interval=15.0, drain_timeout=30.0, allow_origin=None):
+        self.pipeline = pipeline
+        self.host = host
+        self.port = port
+        self.allowed_hosts = loopback_hosts | ({host.lower()} if host not in ("", "0.0.0.0", "::") else set())
+        self.cors_header = f"Access-Control-Allow-Origin: {allow_origin}\r\nVary: Origin\r\n" if allow_origin else ""
+        self.image_folder = image_folder
+        self.max_pending = max_pending
+        self.aggregates_interval = aggregates_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.drain_timeout = drain_timeout
+
+        self.subscribers = set()
+        self.counters = {"events": 0, "requests": 0, "disconnected_slow": 0}
+        self.views = {}  # Sort column -> LogView, built on first use
+        self.views_lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="api-io")
+        self.loop = None
+        self.stopping = None
+        self.thread = None
+
+    def start(self):
+        # Serve on a background thread, e.g. next to the Tk app
+        self.thread = threading.Thread(target=lambda: asyncio.run(self.serve()), name="api-server", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.stopping.set)
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+            self.thread = None
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        self.stopping = asyncio.Event()
+        server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        print(f"API listening on http://{self.host}:{self.port}")
+        aggregates_task = asyncio.create_task(self.publish_aggregates())
+        try:
+            await self.stopping.wait()
+        finally:
+            aggregates_task.cancel()
+            server.close()
+            for subscriber in list(self.subscribers):
+                subscriber.ready.set()
+            await server.wait_closed()
+            self.loop = None
+
+    def publish(self, event, data):
+        # Called from pipeline threads; only schedules the broadcast, never waits on clients
+        loop = self.loop
+        if loop is None or not self.subscribers:
+            return
+        try:
+            loop.call_soon_threadsafe(self.broadcast, event, data)
+        except RuntimeError:
+            pass  # Loop closed while shutting down
+
+    def broadcast(self, event, data):
+        # Encode once, queue for every subscriber
+        message = f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+        self.counters["events"] += 1
+        for subscriber in self.subscribers:
+            subscriber.push(event, message)
+
+    def on_pipeline_event(self, event, payload):
+        # VideoPipeline listener
+        if event == "detections":
+            faces = [{"bbox": [int(value) for value in face["bbox"]], "age": face["age"], "gender": face["gender"],
+                      "track_id": face.get("track_id")} for face in payload]
+            self.publish("detections", {"time": time.time(), "faces": faces})
+        elif event == "captured":
+            self.publish("captured", {"time": time.time(), "filename": payload})
+
+    async def publish_aggregates(self):
+        # Count updates go out only when new captures were logged
+        aggregates = get_capture_aggregates()
+        while True:
+            await asyncio.sleep(self.aggregates_interval)
+            if not self.subscribers:
+                continue
+            added = await self.loop.run_in_executor(self.executor, aggregates.refresh)
+            if added:
+                self.broadcast("aggregates", self.aggregate_counts(aggregates, "All"))
+
+    def aggregate_counts(self, aggregates, date):
+        age_counts, gender_counts = aggregates.counts(date)
+        return {"date": date, "age": dict(age_counts), "gender": dict(gender_counts), "total": sum(gender_counts.values())}
+
+    async def handle_connection(self, reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=10)
+            request_line, *header_lines = request.decode("latin-1").split("\r\n")
+            method, target = request_line.split(" ")[:2]
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ValueError,
+                ConnectionError):
+            writer.close()
+            return
+
+        self.counters["requests"] += 1
+        headers = {}
+        for line in header_lines:
+            name, separator, value = line.partition(":")
+            if separator:
+                headers[name.strip().lower()] = value.strip()
+        url = urlsplit(target)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            if not self.host_allowed(headers.get("host", "")):
+                await self.respond(writer, 403, {"error": "Host not allowed"})
+            elif method != "GET":
+                await self.respond(writer, 405, {"error": "Only GET is supported"})
+            elif url.path == "/events":
+                await self.stream_events(writer, query)
+            elif url.path == "/logs":
+                await self.respond(writer, 200, await self.loop.run_in_executor(self.executor, self.log_page, query))
+            elif url.path == "/aggregates":
+                await self.respond(writer, 200, await self.loop.run_in_executor(self.executor, self.aggregates, query))
+            elif url.path == "/stats":
+                await self.respond(writer, 200, self.stats())
+            elif url.path.startswith("/thumbnails/"):
+                await self.send_thumbnail(writer, unquote(url.path[len("/thumbnails/"):]))
+            else:
+                await self.respond(writer, 404, {"error": f"Unknown path {url.path}"})
+        except ValueError as error:
+            await self.respond(writer, 400, {"error": str(error)})
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def host_allowed(self, host):
+        # The Host header must name this machine (with our port, if any), so a page on another site
+        # cannot reach the API by rebinding its own hostname to 127.0.0.1
+        try:
+            url = urlsplit("//" + host)
+            port = url.port
+        except ValueError:
+            return False
+        return url.hostname in self.allowed_hosts and port in (None, self.port)
+
+    async def respond(self, writer, status, body, content_type="application/json"):
+        if content_type == "application/json":
+            body = json.dumps(body).encode()
+        writer.write(f"HTTP/1.1 {status} {status_texts[status]}\r\nContent-Type: {content_type}\r\n"
+                     f"Content-Length: {len(body)}\r\n{self.cors_header}Connection: close\r\n\r\n".encode())
+        writer.write(body)
+        await writer.drain()
+
+    async def stream_events(self, writer, query):
+        # /events?types=detections,captured,aggregates (all types by default)
+        event_types = set(filter(None, query.get("types", "").split(",")))
+        subscriber = Subscriber(event_types, self.max_pending)
+        writer.write(f"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+                     f"{self.cors_header}Connection: keep-alive\r\n\r\n".encode())
+        # Current counts first so a dashboard can render before the next update
+        aggregates = await self.loop.run_in_executor(self.executor, self.aggregates, {})
+        subscriber.push("aggregates", f"event: aggregates\ndata: {json.dumps(aggregates)}\n\n".encode())
+        self.subscribers.add(subscriber)
+        try:
+            while not self.stopping.is_set():
+                try:
+                    await asyncio.wait_for(subscriber.ready.wait(), timeout=self.heartbeat_interval)
+                except asyncio.TimeoutError:
+                    subscriber.messages.append(b": heartbeat\n\n")
+                subscriber.ready.clear()
+                while subscriber.messages:
+                    writer.write(subscriber.messages.popleft())
+                # Waiting here only holds up this client; new events keep queuing (and dropping) for it
+                try:
+                    await asyncio.wait_for(writer.drain(), timeout=self.drain_timeout)
+                except asyncio.TimeoutError:
+                    self.counters["disconnected_slow"] += 1
+                    return
+        finally:
+            self.subscribers.discard(subscriber)
+
+    def log_page(self, query):
+        # Runs on the executor: /logs?offset=0&limit=100&sort=Date&order=desc
+        offset = int(query.get("offset", 0))
+        limit = min(int(query.get("limit", 100)), 500)
+        sort = query.get("sort") or None
+        if sort is not None and sort not in LogView.sort_fields:
+            raise ValueError(f"Cannot sort by {sort}")
+        with self.views_lock:
+            view = self.views.get(sort)
+            if view is None:
+                view = self.views[sort] = LogView(get_capture_log())
+                if sort is not None:
+                    view.sort(sort)
+            total = view.refresh()
+            view.reverse = query.get("order", "desc") == "desc"
+            records = view.page(offset, offset + limit)
+        return {"total": total, "offset": offset, "limit": limit, "sort": sort, "records": records}
+
+    def aggregates(self, query):
+        # /aggregates?date=2024-01-14, or a range: ?from=2024-01-01&to=2024-03-31 (or last_days=30)&hours=10-14,
+        # with granularity=hour|day|week for a series instead of one total
+        aggregates = get_capture_aggregates()
+        aggregates.refresh()
+        if not {"from", "to", "last_days", "hours", "granularity"} & set(query):
+            return self.aggregate_counts(aggregates, query.get("date", "All"))
+
+        if "last_days" in query:
+            start, end = last_days(int(query["last_days"]))
+        else:
+            start, end = query.get("from"), query.get("to")
+        hours = parse_hours(query["hours"]) if "hours" in query else None
+        result = {"from": start, "to": end, "hours": hours}
+        if "granularity" in query:
+            result["series"] = [{"key": key, "age": dict(age_counts), "gender": dict(gender_counts), "total": total}
+                                for key, age_counts, gender_counts, total in
+                                aggregates.series(query["granularity"], start, end, hours)]
+        else:
+            age_counts, gender_counts = aggregates.query(start, end, hours)
+            result.update({"age": dict(age_counts), "gender": dict(gender_counts), "total": sum(gender_counts.values())})
+        return result
+
+    def stats(self):
+        stats = {"server": dict(self.counters, subscribers=len(self.subscribers),
+                                dropped=sum(subscriber.dropped for subscriber in self.subscribers)),
+                 "profile": get_profiler().summary()}
+        if self.pipeline is not None:
+            stats["pipeline"] = self.pipeline.stats()
+        return stats
+
+    async def send_thumbnail(self, writer, filename):
+        # Only captures known to the store are served
+        filename = os.path.basename(filename)
+        image_path = get_capture_store(self.image_folder).resolve(filename)
+        if not filename or not os.path.isfile(image_path):
+            await self.respond(writer, 404, {"error": f"No capture named {filename}"})
+            return
+        cache = get_thumbnail_cache()
+        if not cache.is_fresh(image_path):
+            await self.loop.run_in_executor(self.executor, cache.generate, image_path)
+        try:
+            with open(cache.thumbnail_path(image_path), "rb") as thumbnail_file:
+                body = thumbnail_file.read()
+        except OSError:
+            await self.respond(writer, 404, {"error": f"No thumbnail for {filename}"})
+            return
+        await self.respond(writer, 200, body, "image/jpeg")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local HTTP/SSE API for live detections, counts, logs and thumbnails")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--no-camera", action="store_true", help="Serve logs, counts and thumbnails only")
+    parser.add_argument("--allow-origin", help="Origin allowed to read responses from a browser, e.g. http://localhost:3000")
+    args = parser.parse_args()
+
+    pipeline = None
+    if not args.no_camera:
+        from engine import get_engine, shutdown_engine
+        pipeline = get_engine().start()
+    server = ApiServer(pipeline, args.host, args.port, allow_origin=args.allow_origin)
+    if pipeline is not None:
+        pipeline.add_listener(server.on_pipeline_event)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if pipeline is not None:
+            shutdown_engine()
+
+
+if __name__ == "__main__":
+    main()
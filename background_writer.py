@@ -0,0 +1,63 @@
+import queue
+import threading
+
+
+class BackgroundWriter:
+    # Runs capture persistence jobs on one thread behind a bounded queue; a full queue drops the new job
+    def __init__(self, max_pending=16, name="capture-writer"):
+        self.jobs = queue.Queue(maxsize=max_pending)
+        self.lock = threading.Lock()
+        self.counters = {"queued": 0, "written": 0, "dropped": 0, "failed": 0}
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, name=name, daemon=True)
+        self.thread.start()
+
+    def submit(self, job, *args):
+        # Never blocks the caller; returns False when the job was dropped
+        if self.closed:
+            return False
+        try:
+            self.jobs.put_nowait((job, args))
+        except queue.Full:
+            with self.lock:
+                self.counters["dropped"] += 1
+            return False
+        with self.lock:
+            self.counters["queued"] += 1
+        return True
+
+    def run(self):
+        while True:
+            item = self.jobs.get()
+            if item is None:
+                self.jobs.task_done()
+                return
+            job, args = item
+            try:
+                job(*args)
+                with self.lock:
+                    self.counters["written"] += 1
+            except Exception as error:
+                with self.lock:
+                    self.counters["failed"] += 1
+                print(f"Capture write failed: {error}")
+            finally:
+                self.jobs.task_done()
+
+    def flush(self):
+        # Wait until every queued job has been written
+        self.jobs.join()
+
+    def close(self):
+        # Write out what is queued, then stop the thread
+        if self.closed:
+            return
+        self.closed = True
+        self.jobs.put(None)
+        self.thread.join()
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+        stats["pending"] = self.jobs.qsize()
+        return stats
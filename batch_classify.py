@@ -0,0 +1,149 @@
+import argparse
+import os
+import time
+import multiprocessing
+from datetime import datetime
+import cv2
+from inference import FrameAnalyzer, detector_profiles, get_classifier_variant
+from dnn_backend import load_networks, select_dnn_settings
+from capture_log import CaptureLog
+
+image_extensions = ('.png', '.jpg', '.jpeg', '.gif', '.bmp')
+video_extensions = ('.mp4', '.avi', '.mov', '.mkv', '.m4v', '.mpg', '.mpeg', '.wmv')
+
+
+def iter_image_paths(folder):
+    # Walk a folder tree such as dataset/ in a stable order
+    for root, dirs, files in os.walk(folder):
+        dirs.sort()
+        for filename in sorted(files):
+            if filename.lower().endswith(image_extensions):
+                yield os.path.join(root, filename)
+
+
+def iter_video_frames(path, frame_skip=0):
+    video = cv2.VideoCapture(path)
+    fps = video.get(cv2.CAP_PROP_FPS) or 0
+    frame_index = 0
+    try:
+        while True:
+            # grab() skips decoding the frames we are not going to process
+            if frame_index % (frame_skip + 1):
+                if not video.grab():
+                    break
+                frame_index += 1
+                continue
+            ret, frame = video.read()
+            if not ret:
+                break
+            offset = frame_index / fps if fps else None
+            yield {"source": path, "frame": frame_index, "offset": offset}, frame
+            frame_index += 1
+    finally:
+        video.release()
+
+
+def iter_frames(sources, frame_skip=0):
+    # Stream (info, frame) pairs from video files, image files and image folders
+    for source in sources:
+        if os.path.isdir(source):
+            for index, path in enumerate(iter_image_paths(source)):
+                if index % (frame_skip + 1):
+                    continue
+                frame = cv2.imread(path)
+                if frame is not None:
+                    yield {"source": path, "frame": 0, "offset": None}, frame
+        elif source.lower().endswith(image_extensions):
+            frame = cv2.imread(source)
+            if frame is not None:
+                yield {"source": source, "frame": 0, "offset": None}, frame
+        else:
+            yield from iter_video_frames(source, frame_skip)
+
+
+worker_analyzer = None
+
+
+def init_worker(profile="default", variant="caffe-fp32", dnn_settings=None):
+    # Each worker process loads its own copy of the networks, on the backends chosen by the parent
+    global worker_analyzer
+    faceNet, ageNet, genderNet = load_networks(dnn_settings or select_dnn_settings(), variant)
+    worker_analyzer = FrameAnalyzer(faceNet, ageNet, genderNet, profile=profile, variant=variant)
+
+
+def analyze_item(item):
+    info, frame = item
+    _, faces = worker_analyzer.analyze(frame)
+    return info, faces
+
+
+def log_records(info, faces, processed_at):
+    for face in faces:
+        yield {
+            "Date": processed_at.strftime('%Y-%m-%d'),
+            "Time": processed_at.strftime('%H:%M:%S'),
+            "Gender": face["gender"],
+            "Age": face["age"],
+            "Image Captured Filename": os.path.basename(info["source"]),
+            "Source": info["source"],
+            "Frame": info["frame"],
+            "Offset": info["offset"],
+            "Box": [int(value) for value in face["bbox"]],
+        }
+
+
+def run(sources, output="batch_log.jsonl", frame_skip=0, workers=1, report_every=100, profile="default", variant="caffe-fp32"):
+    capture_log = CaptureLog(path=output, legacy_path=None)
+    frames = iter_frames(sources, frame_skip)
+
+    # Fail here on an unknown variant; a pool would keep restarting workers that cannot load it
+    get_classifier_variant(variant)
+    # Benchmarked (or recorded) once here, not by every worker
+    dnn_settings = select_dnn_settings()
+    if workers > 1:
+        pool = multiprocessing.Pool(workers, initializer=init_worker, initargs=(profile, variant, dnn_settings))
+        results = pool.imap(analyze_item, frames, chunksize=4)
+    else:
+        pool = None
+        init_worker(profile, variant, dnn_settings)
+        results = map(analyze_item, frames)
+
+    start = time.perf_counter()
+    processed = 0
+    faces_found = 0
+    try:
+        for info, faces in results:
+            for record in log_records(info, faces, datetime.now()):
+                capture_log.append(record)
+            processed += 1
+            faces_found += len(faces)
+            if report_every and processed % report_every == 0:
+                elapsed = time.perf_counter() - start
+                print(f"{processed} frames, {faces_found} faces, {processed / elapsed:.1f} fps")
+    finally:
+        if pool is not None:
+            pool.terminate()
+        capture_log.close()
+
+    elapsed = time.perf_counter() - start
+    fps = processed / elapsed if elapsed else 0.0
+    print(f"Done: {processed} frames, {faces_found} faces in {elapsed:.1f}s ({fps:.1f} fps) -> {output}")
+    return {"frames": processed, "faces": faces_found, "seconds": elapsed, "fps": fps}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classify age and gender in video files and image folders without a display")
+    parser.add_argument("sources", nargs="+", help="Video files, image files or folders (e.g. dataset)")
+    parser.add_argument("--output", default="batch_log.jsonl", help="Capture log (JSON Lines) to append results to")
+    parser.add_argument("--frame-skip", type=int, default=0, help="Frames to skip between processed frames")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes")
+    parser.add_argument("--report-every", type=int, default=100, help="Print throughput every N frames")
+    parser.add_argument("--profile", default="default", choices=list(detector_profiles), help="Detector speed/accuracy profile")
+    parser.add_argument("--variant", default="caffe-fp32", help="Age/gender classifier variant (see classifier_variants.json)")
+    args = parser.parse_args()
+
+    run(args.sources, args.output, args.frame_skip, args.workers, args.report_every, args.profile, args.variant)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+import argparse
+import multiprocessing
+import queue
+import glob
+import itertools
+import json
+import os
+import time
+import cv2
+import numpy as np
+import inference
+from anonymize import Anonymizer, anonymize_modes
+from tracking import iou
+from evaluate import iter_age_dataset, largest_face
+from frame_ring import FrameRing
+
+
+def median_ms(fn, repeats):
+    # Median wall-clock time of fn() in milliseconds
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+def sample_face_crops(count, dataset_folder="dataset"):
+    # Collect real face crops from the labeled dataset
+    faceNet = cv2.dnn.readNet(inference.faceModel, inference.faceProto)
+    crops = []
+    for path in sorted(glob.glob(os.path.join(dataset_folder, "*", "*", "*"))):
+        frame = cv2.imread(path)
+        if frame is None:
+            continue
+        frame, bboxs = inference.face_box(faceNet, frame)
+        for bbox in bboxs:
+            face = frame[inference.face_region(frame, bbox)]
+            if face.size:
+                crops.append(face)
+        if len(crops) >= count:
+            return crops[:count]
+    return crops
+
+
+def bench_batched(args):
+    _, ageNet, genderNet = inference.load_networks()
+    crops = sample_face_crops(args.max_faces)
+
+    print(f"{'faces':>5} {'per-face ms':>12} {'batched ms':>11} {'speedup':>8} {'match':>6}")
+    for count in range(1, len(crops) + 1):
+        faces = crops[:count]
+        per_face = [inference.classify_face(ageNet, genderNet, face) for face in faces]
+        batched = inference.classify_faces(ageNet, genderNet, faces)
+
+        per_face_ms = median_ms(lambda: [inference.classify_face(ageNet, genderNet, face) for face in faces], args.repeats)
+        batched_ms = median_ms(lambda: inference.classify_faces(ageNet, genderNet, faces), args.repeats)
+        print(f"{count:>5} {per_face_ms:>12.2f} {batched_ms:>11.2f} {per_face_ms / batched_ms:>7.2f}x {str(per_face == batched):>6}")
+
+
+def bench_anonymize(args):
+    # Cost of each privacy filter per megapixel of face area
+    rng = np.random.default_rng(0)
+    print(f"{'mode':>9} {'face px':>8} {'ms':>8} {'ms/MP':>8}")
+    for mode in anonymize_modes:
+        anonymizer = Anonymizer(mode, blocks=args.blocks)
+        for size in args.sizes:
+            face = rng.integers(0, 256, (size, size, 3), dtype=np.uint8)
+            elapsed = median_ms(lambda: anonymizer.apply(face), args.repeats)
+            print(f"{mode:>9} {size:>4}x{size:<3} {elapsed:>8.2f} {elapsed / (size * size / 1e6):>8.1f}")
+
+
+def load_labeled_frames(folder):
+    # labels.json maps image filename -> [[x1, y1, x2, y2], ...]; without it every image counts as one face
+    labels_path = os.path.join(folder, "labels.json")
+    labels = None
+    if os.path.exists(labels_path):
+        with open(labels_path) as labels_file:
+            labels = json.load(labels_file)
+        paths = [os.path.join(folder, filename) for filename in sorted(labels)]
+    else:
+        paths = sorted(path for path in glob.glob(os.path.join(folder, "**", "*"), recursive=True)
+                       if path.lower().endswith(('.png', '.jpg', '.jpeg')))
+
+    for path in paths:
+        frame = cv2.imread(path)
+        if frame is not None:
+            yield frame, labels.get(os.path.basename(path)) if labels is not None else None
+
+
+def bench_detector(args):
+    # Detection latency and recall per profile over a folder of labeled frames
+    faceNet = cv2.dnn.readNet(inference.faceModel, inference.faceProto)
+    frames = list(itertools.islice(load_labeled_frames(args.folder), args.limit))
+    print(f"{'profile':>9} {'p50 ms':>8} {'p95 ms':>8} {'recall':>7} {'detections':>11}")
+    for profile in args.profiles:
+        timings, found, expected, detections = [], 0, 0, 0
+        for frame, boxes in frames:
+            start = time.perf_counter()
+            bboxs, _ = inference.detect_faces(faceNet, frame, profile)
+            timings.append((time.perf_counter() - start) * 1000)
+            detections += len(bboxs)
+            if boxes is None:
+                # Unlabeled images: a hit is any detection at all
+                expected += 1
+                found += bool(bboxs)
+            else:
+                expected += len(boxes)
+                found += sum(any(iou(box, bbox) >= args.iou for bbox in bboxs) for box in boxes)
+        timings.sort()
+        recall = found / expected if expected else 0.0
+        print(f"{profile:>9} {timings[len(timings) // 2]:>8.2f} {timings[int(len(timings) * 0.95)]:>8.2f} "
+              f"{recall:>7.3f} {detections:>11}")
+
+
+def decode_scalar(detection, frame_shape, confidence_threshold=0.7):
+    # The per-candidate Python loop face_box used before the vectorized decode
+    frameHeight, frameWidth = frame_shape[:2]
+    bboxs = []
+    for i in range(detection.shape[2]):
+        confidence = detection[0, 0, i, 2]
+        if confidence > confidence_threshold:
+            x1 = int(detection[0, 0, i, 3] * frameWidth)
+            y1 = int(detection[0, 0, i, 4] * frameHeight)
+            x2 = int(detection[0, 0, i, 5] * frameWidth)
+            y2 = int(detection[0, 0, i, 6] * frameHeight)
+            bboxs.append([x1, y1, x2, y2])
+    # Same clipping as face_region, one box at a time
+    padding = inference.padding
+    windows = [(max(0, y1 - padding), min(y2 + padding, frameHeight - 1),
+                max(0, x1 - padding), min(x2 + padding, frameWidth - 1)) for x1, y1, x2, y2 in bboxs]
+    return bboxs, windows
+
+
+def bench_decode(args):
+    # Scalar loop vs vectorized decode of real detector output
+    faceNet = cv2.dnn.readNet(inference.faceModel, inference.faceProto)
+    print(f"{'image':>40} {'candidates':>10} {'faces':>6} {'scalar us':>10} {'vector us':>10}")
+    for frame, _ in itertools.islice(load_labeled_frames(args.folder), args.limit):
+        detection = inference.run_detector(faceNet, frame)
+        scalar_ms = median_ms(lambda: decode_scalar(detection, frame.shape), args.repeats)
+        vector_ms = median_ms(lambda: inference.crop_windows(inference.decode_detections(detection, frame.shape)[0], frame.shape),
+                              args.repeats)
+        faces = len(inference.decode_detections(detection, frame.shape)[0])
+        print(f"{frame.shape[1]:>34}x{frame.shape[0]:<5} {detection.shape[2]:>10} {faces:>6} "
+              f"{scalar_ms * 1000:>10.1f} {vector_ms * 1000:>10.1f}")
+
+
+def print_confusion(confusion, labels):
+    print(" " * 8 + "".join(f"{label:>7}" for label in labels))
+    for label, row in zip(labels, confusion):
+        print(f"{label:>8}" + "".join(f"{count:>7}" for count in row))
+
+
+def bench_classifiers(args):
+    # Accuracy, confusion and latency of each classifier variant over the labeled age folders
+    faceNet = cv2.dnn.readNet(inference.faceModel, inference.faceProto)
+    # Limit before detection, so --limit also bounds the detector work
+    frames = ((cv2.imread(path), bucket) for path, bucket in iter_age_dataset(args.dataset))
+    readable = ((frame, bucket) for frame, bucket in frames if frame is not None)
+    samples = [(largest_face(faceNet, frame), bucket) for frame, bucket in itertools.islice(readable, args.limit)]
+
+    variants = inference.load_classifier_variants()
+    summary = []
+    for variant in args.variants or list(variants):
+        try:
+            _, ageNet, genderNet = inference.load_networks(variant)
+        except cv2.error as error:
+            print(f"{variant}: skipped ({error})")
+            continue
+        input_size = inference.classifier_input_size(variant)
+
+        confusion = np.zeros((len(inference.ageList), len(inference.ageList)), dtype=int)
+        genders = {gender: 0 for gender in inference.genderList}
+        timings = []
+        for face, bucket in samples:
+            start = time.perf_counter()
+            age, gender = inference.classify_face(ageNet, genderNet, face, input_size)
+            timings.append((time.perf_counter() - start) * 1000)
+            confusion[inference.ageList.index(bucket), inference.ageList.index(age)] += 1
+            genders[gender] += 1
+
+        timings.sort()
+        accuracy = np.trace(confusion) / confusion.sum() if confusion.sum() else 0.0
+        # Off by one bucket still counts for the "within one" figure
+        within_one = sum(confusion[i, j] for i in range(len(confusion)) for j in range(len(confusion)) if abs(i - j) <= 1)
+        summary.append((variant, accuracy, within_one / max(1, confusion.sum()), timings[len(timings) // 2],
+                        timings[int(len(timings) * 0.95)]))
+        print(f"\n{variant} (rows: labeled age, columns: predicted age; gender split {genders})")
+        print_confusion(confusion, inference.ageList)
+
+    print(f"\n{'variant':>16} {'accuracy':>9} {'within 1':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for variant, accuracy, within_one, p50, p95 in summary:
+        print(f"{variant:>16} {accuracy:>9.3f} {within_one:>9.3f} {p50:>8.2f} {p95:>8.2f}")
+
+
+def rss_mb():
+    # Current resident set size; Linux only, None elsewhere
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        return None
+
+
+def bench_display(args):
+    # Soak test of the Tk display path: memory and canvas items should stay flat over time
+    import tkinter as tk
+    from PIL import Image, ImageTk
+    from realtime_video import FrameView
+
+    root = tk.Tk()
+    canvas = tk.Canvas(root, width=args.width, height=args.height)
+    canvas.pack()
+    view = FrameView(canvas)
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, (args.height, args.width, 3), dtype=np.uint8) for _ in range(8)]
+
+    def show_legacy(frame):
+        # The old path: a new PhotoImage and a new canvas item per frame
+        photo = ImageTk.PhotoImage(image=Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)))
+        canvas.create_image(0, 0, anchor=tk.NW, image=photo)
+        canvas.image = photo
+
+    show = show_legacy if args.legacy else view.show
+    print(f"{'minutes':>8} {'frames':>8} {'ms/frame':>9} {'rss MB':>8} {'items':>6}")
+    start = last_report = time.perf_counter()
+    rendered = reported = 0
+    while time.perf_counter() - start < args.minutes * 60:
+        show(frames[rendered % len(frames)])
+        root.update()
+        rendered += 1
+        now = time.perf_counter()
+        if now - last_report >= args.report_every:
+            ms_per_frame = (now - last_report) * 1000 / (rendered - reported)
+            rss = rss_mb()
+            print(f"{(now - start) / 60:>8.1f} {rendered:>8} {ms_per_frame:>9.2f} "
+                  f"{rss if rss is not None else float('nan'):>8.1f} {len(canvas.find_all()):>6}")
+            last_report, reported = now, rendered
+    root.destroy()
+
+
+def pickled_frame_worker(work, results):
+    # Receives whole frames through a queue; the result is tiny, as with real detections
+    while True:
+        item = work.get()
+        if item is None:
+            return
+        sequence, frame = item
+        results.put((sequence, float(frame[::16, ::16].mean())))
+
+
+def ring_frame_worker(spec, work, results):
+    name, slots, frame_shape = spec
+    ring = FrameRing(slots, frame_shape, name=name)
+    try:
+        while True:
+            item = work.get()
+            if item is None:
+                return
+            slot, sequence = item
+            frame = ring.read(slot, sequence)
+            results.put((sequence, float(frame[::16, ::16].mean())))
+    finally:
+        ring.close()
+
+
+def run_transport(mode, frames, count, workers, slots):
+    # Frames/s through worker processes that only touch the pixels, so transport dominates
+    work, results = multiprocessing.Queue(), multiprocessing.Queue()
+    ring = FrameRing(slots, frames[0].shape) if mode == "ring" else None
+    if ring is not None:
+        processes = [multiprocessing.Process(target=ring_frame_worker, args=(ring.spec(), work, results)) for _ in range(workers)]
+    else:
+        processes = [multiprocessing.Process(target=pickled_frame_worker, args=(work, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+
+    # Same in-flight limit for both modes so neither can buffer further ahead
+    free_slots = list(range(slots))
+    latencies, in_flight = [], {}
+    start = time.perf_counter()
+    sent = received = 0
+    while received < count:
+        while sent < count and free_slots:
+            slot = free_slots.pop()
+            frame = frames[sent % len(frames)]
+            in_flight[sent] = (time.perf_counter(), slot)
+            if ring is not None:
+                ring.write(slot, frame, sent)
+                work.put((slot, sent))
+            else:
+                work.put((sent, frame))
+            sent += 1
+        try:
+            sequence, _ = results.get(timeout=5)
+        except queue.Empty:
+            break
+        submitted, slot = in_flight.pop(sequence)
+        free_slots.append(slot)
+        latencies.append((time.perf_counter() - submitted) * 1000)
+        received += 1
+    elapsed = time.perf_counter() - start
+
+    for _ in processes:
+        work.put(None)
+    for process in processes:
+        process.join()
+    if ring is not None:
+        ring.close()
+    latencies.sort()
+    return received / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)]
+
+
+def bench_ring(args):
+    # Shared-memory frame ring vs pickling frames through multiprocessing queues
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, (args.height, args.width, 3), dtype=np.uint8) for _ in range(4)]
+    print(f"{'transport':>9} {'workers':>7} {'frames/s':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for workers in args.workers:
+        for mode in ("pickle", "ring"):
+            fps, p50, p95 = run_transport(mode, frames, args.frames, workers, args.slots)
+            print(f"{mode:>9} {workers:>7} {fps:>9.1f} {p50:>8.2f} {p95:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Performance benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    batched_parser = subparsers.add_parser("batched", help="Per-face vs batched age/gender latency by face count")
+    batched_parser.add_argument("--max-faces", type=int, default=15)
+    batched_parser.add_argument("--repeats", type=int, default=20)
+    batched_parser.set_defaults(func=bench_batched)
+
+    anonymize_parser = subparsers.add_parser("anonymize", help="Cost per megapixel of each face anonymization mode")
+    anonymize_parser.add_argument("--sizes", type=int, nargs="+", default=[64, 128, 256, 512])
+    anonymize_parser.add_argument("--blocks", type=int, default=8)
+    anonymize_parser.add_argument("--repeats", type=int, default=20)
+    anonymize_parser.set_defaults(func=bench_anonymize)
+
+    detector_parser = subparsers.add_parser("detector", help="Detection latency and recall per detector profile")
+    detector_parser.add_argument("folder", nargs="?", default="dataset", help="Frames, optionally with labels.json")
+    detector_parser.add_argument("--profiles", nargs="+", default=list(inference.detector_profiles))
+    detector_parser.add_argument("--iou", type=float, default=0.5, help="IoU for a labeled face to count as found")
+    detector_parser.add_argument("--limit", type=int, default=None)
+    detector_parser.set_defaults(func=bench_detector)
+
+    decode_parser = subparsers.add_parser("decode", help="Scalar vs vectorized SSD detection decode")
+    decode_parser.add_argument("folder", nargs="?", default="dataset")
+    decode_parser.add_argument("--limit", type=int, default=10)
+    decode_parser.add_argument("--repeats", type=int, default=200)
+    decode_parser.set_defaults(func=bench_decode)
+
+    classifiers_parser = subparsers.add_parser("classifiers", help="Accuracy, confusion and latency of classifier variants")
+    classifiers_parser.add_argument("--dataset", default="dataset")
+    classifiers_parser.add_argument("--variants", nargs="*", help="Defaults to every known variant")
+    classifiers_parser.add_argument("--limit", type=int, default=None)
+    classifiers_parser.set_defaults(func=bench_classifiers)
+
+    display_parser = subparsers.add_parser("display", help="Soak test of the Tk frame display path (needs a display)")
+    display_parser.add_argument("--minutes", type=float, default=60.0)
+    display_parser.add_argument("--width", type=int, default=640)
+    display_parser.add_argument("--height", type=int, default=480)
+    display_parser.add_argument("--report-every", type=float, default=30.0, help="Seconds between reports")
+    display_parser.add_argument("--legacy", action="store_true", help="Measure the old new-item-per-frame path")
+    display_parser.set_defaults(func=bench_display)
+
+    ring_parser = subparsers.add_parser("ring", help="Shared-memory frame ring vs queue pickling between processes")
+    ring_parser.add_argument("--frames", type=int, default=2000)
+    ring_parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    ring_parser.add_argument("--slots", type=int, default=8)
+    ring_parser.add_argument("--width", type=int, default=640)
+    ring_parser.add_argument("--height", type=int, default=480)
+    ring_parser.set_defaults(func=bench_ring)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import os
+import cv2
+from datetime import datetime
+from inference import face_region, draw_labels
+from capture_log import get_capture_log
+from thumbnail_cache import get_thumbnail_cache
+from background_writer import BackgroundWriter
+from anonymize import Anonymizer
+from profiling import get_profiler
+from capture_store import get_capture_store
+
+# Encoder parameters per image format: (extension, OpenCV flag, default level)
+image_formats = {
+    "png": (".png", cv2.IMWRITE_PNG_COMPRESSION, 3),
+    "jpg": (".jpg", cv2.IMWRITE_JPEG_QUALITY, 90),
+    "webp": (".webp", cv2.IMWRITE_WEBP_QUALITY, 90),
+}
+
+
+class CaptureRecorder:
+    # Seconds between two saved captures when faces carry no track identity
+    capture_interval = 10
+
+    def __init__(self, output_folder="captured_images", capture_log=None, camera=None, min_votes=2, forget_after=60,
+                 visit_gap=1.0, image_format="png", level=None, max_pending=16, anonymizer=None):
+        self.output_folder = output_folder
+        self.capture_log = capture_log or get_capture_log()
+        self.camera = camera  # Tags records and filenames when several cameras share the log
+        self.last_capture_time = datetime.now()
+
+        # Tracked faces are logged once per visit, after their label has min_votes classifications.
+        # A visit that ends sooner is logged with the label it had, from its last labeled frame.
+        self.min_votes = min_votes
+        self.forget_after = forget_after
+        self.visit_gap = visit_gap  # Seconds a labeled track may be unseen before its visit counts as ended
+        self.logged_tracks = {}  # track_id -> last time it was seen
+        self.pending_tracks = {}  # track_id -> (last time seen, face, (frame, faces)) while collecting votes
+
+        # Images go into date/camera partitions of the output folder
+        self.store = get_capture_store(self.output_folder)
+
+        # Blur, encode and logging run on a background writer; level is PNG compression or JPEG/WebP quality
+        self.extension, encode_flag, default_level = image_formats[image_format]
+        self.encode_params = [encode_flag, default_level if level is None else level]
+        self.writer = BackgroundWriter(max_pending)
+
+        # Privacy filter applied to every face before the image is written
+        self.anonymizer = anonymizer or Anonymizer("gaussian")
+
+    def maybe_capture(self, frame, faces):
+        # Save a blurred copy of the frame when a new person appears
+        current_time = datetime.now()
+        ended_filename = self.capture_ended_visits(current_time)
+        if not faces:
+            return ended_filename
+
+        if any("track_id" not in face for face in faces):
+            return self.capture_on_interval(frame, faces, current_time) or ended_filename
+
+        new_faces = []
+        snapshot = None
+        for face in faces:
+            track_id = face["track_id"]
+            if track_id in self.logged_tracks:
+                self.logged_tracks[track_id] = current_time
+            elif face["age"] is None:
+                continue
+            elif face.get("votes", self.min_votes) >= self.min_votes:
+                self.logged_tracks[track_id] = current_time
+                self.pending_tracks.pop(track_id, None)
+                new_faces.append(face)
+            else:
+                # Keep its latest labeled frame in case the visit ends before the next vote
+                if snapshot is None:
+                    snapshot = (frame.copy(), faces)
+                self.pending_tracks[track_id] = (current_time, face, snapshot)
+        self.forget_tracks(current_time)
+
+        if not new_faces:
+            return ended_filename
+        image_filename = self.save(frame.copy(), faces, new_faces, current_time)
+        if image_filename is None:
+            # The writer was full; let these people be picked up on a later frame
+            for face in new_faces:
+                del self.logged_tracks[face["track_id"]]
+        return image_filename or ended_filename
+
+    def capture_ended_visits(self, current_time, everything=False):
+        # Log labeled tracks that left before reaching min_votes, one image per frame they were last seen in
+        ended = [track_id for track_id, (last_seen, _, _) in self.pending_tracks.items()
+                 if everything or (current_time - last_seen).total_seconds() > self.visit_gap]
+        by_snapshot = {}
+        for track_id in ended:
+            last_seen, face, snapshot = self.pending_tracks.pop(track_id)
+            by_snapshot.setdefault(id(snapshot), (last_seen, snapshot, []))[2].append(face)
+
+        image_filename = None
+        for last_seen, snapshot, new_faces in by_snapshot.values():
+            saved = self.save(snapshot[0], snapshot[1], new_faces, last_seen)
+            if saved is None:
+                # The writer was full; try again on the next frame
+                for face in new_faces:
+                    self.pending_tracks[face["track_id"]] = (last_seen, face, snapshot)
+                continue
+            for face in new_faces:
+                self.logged_tracks[face["track_id"]] = last_seen
+            image_filename = saved
+        return image_filename
+
+    def capture_on_interval(self, frame, faces, current_time):
+        # Untracked faces fall back to one capture every capture_interval seconds
+        time_difference = current_time - self.last_capture_time
+        if time_difference.total_seconds() < self.capture_interval:
+            return None
+
+        image_filename = self.save(frame.copy(), faces, faces, current_time)
+        if image_filename is not None:
+            self.last_capture_time = current_time
+        return image_filename
+
+    def forget_tracks(self, current_time):
+        # Drop tracks that have been out of view long enough to have ended
+        for track_id, last_seen in list(self.logged_tracks.items()):
+            if (current_time - last_seen).total_seconds() > self.forget_after:
+                del self.logged_tracks[track_id]
+
+    def save(self, frame, faces, new_faces, current_time):
+        # Pick the filename now and hand the slow work to the writer; None if the writer is full.
+        # The filename carries the labels of the first newly logged face
+        age = new_faces[0]["age"]
+        gender = new_faces[0]["gender"]
+
+        # Save the image with a timestamp in the filename
+        timestamp = current_time.strftime("%Y%m%d%H%M%S")
+        age_gender_timestamp = f"{age}_{gender}_{timestamp}"
+        if self.camera:
+            age_gender_timestamp += f"_{self.camera}"
+        # The store's counter is shared by every recorder writing to this folder and survives restarts
+        sequence = self.store.next_sequence()
+        image_filename = f"{age_gender_timestamp}_{sequence}{self.extension}"
+        image_path = os.path.join(self.store.partition_path(current_time.strftime('%Y-%m-%d'), self.camera), image_filename)
+        manifest_entry = {"sequence": sequence, "time": current_time.strftime('%Y-%m-%d %H:%M:%S'), "age": age,
+                          "gender": gender, "faces": len(new_faces)}
+
+        # Build one record per newly seen face for the capture log
+        records = []
+        for face in new_faces:
+            log_data = {
+                "Date": current_time.strftime('%Y-%m-%d'),
+                "Time": current_time.strftime('%H:%M:%S'),
+                "Gender": face["gender"],
+                "Age": face["age"],
+                "Image Captured Filename": image_filename
+            }
+            if "track_id" in face:
+                log_data["Track"] = face["track_id"]
+            if self.camera:
+                log_data["Camera"] = self.camera
+            records.append(log_data)
+
+        if not self.writer.submit(self.write_capture, frame, faces, image_path, records, manifest_entry):
+            return None
+        return image_filename
+
+    def write_capture(self, frame, faces, image_path, records, manifest_entry):
+        # Runs on the writer thread
+        # Anonymize only inside the red facebox
+        for face in faces:
+            bbox = face["bbox"]
+            region = face_region(frame, bbox)
+
+            # Anonymize the face region
+            frame[region] = self.anonymizer.apply(frame[region])
+
+            # Draw the red facebox and labels on the saved image
+            cv2.rectangle(frame, (bbox[0], bbox[1]), (bbox[2], bbox[3]), (0, 0, 255), 2)
+            draw_labels(frame, bbox, face["age"], face["gender"])
+
+        # Save the image with blur applied
+        os.makedirs(os.path.dirname(image_path), exist_ok=True)
+        with get_profiler().stage("write"):
+            if not cv2.imwrite(image_path, frame, self.encode_params):
+                raise OSError(f"Could not write {image_path}")
+        self.store.add_to_manifest(image_path, manifest_entry)
+        print(f"Blurred Image captured and saved: {image_path}")
+
+        # Build the grid thumbnail in the background while the capture is fresh
+        get_thumbnail_cache().schedule(image_path)
+
+        # The records only go to the log once their image exists
+        for log_data in records:
+            self.capture_log.append(log_data)
+
+    def close(self):
+        # Log visits still collecting votes, then flush queued captures to disk
+        self.capture_ended_visits(datetime.now(), everything=True)
+        self.writer.close()
+
+    def stats(self):
+        return self.writer.stats()
@@ -0,0 +1,253 @@
+import os
+import csv
+import json
+import argparse
+import threading
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from json.decoder import JSONDecodeError
+from capture_log import get_capture_log
+
+granularities = ("hour", "day", "week")
+# Bumped whenever the saved rollups change shape; older files are rebuilt from the log
+counts_version = 2
+
+
+def new_bucket():
+    return {"age": Counter(), "gender": Counter(), "total": 0}
+
+
+def week_of(day):
+    # Rollup key of the week containing day ("YYYY-MM-DD"): the date of its Monday
+    try:
+        parsed = date.fromisoformat(day)
+    except ValueError:
+        return ""
+    return (parsed - timedelta(days=parsed.weekday())).isoformat()
+
+
+def hour_key(log_entry):
+    # "YYYY-MM-DD HH", or None when the record has no usable time
+    day, time = log_entry.get("Date", ""), log_entry.get("Time", "")
+    if not day or len(time) < 2 or not time[:2].isdigit():
+        return None
+    return f"{day} {time[:2]}"
+
+
+def parse_hours(value):
+    # "10-14" -> (10, 14): hours 10:00 up to 14:00
+    first, last = (int(part) for part in value.split("-"))
+    if not 0 <= first < last <= 24:
+        raise ValueError(f"Hour range must be within 0-24: {value}")
+    return first, last
+
+
+def check_range(start, end):
+    # (start, end) as "YYYY-MM-DD" (None = open); a malformed or reversed range is an error, not zero counts
+    days = []
+    for day in (start, end):
+        try:
+            days.append(None if day is None else date.fromisoformat(day).isoformat())
+        except (TypeError, ValueError):
+            raise ValueError(f"Dates must be YYYY-MM-DD: {day}") from None
+    if days[0] is not None and days[1] is not None and days[0] > days[1]:
+        raise ValueError(f"Range starts after it ends: {days[0]} > {days[1]}")
+    return days
+
+
+def last_days(days, today=None):
+    # (start, end) dates covering the last N days, today included
+    today = today or date.today()
+    return (today - timedelta(days=days - 1)).isoformat(), today.isoformat()
+
+
+class CaptureAggregates:
+    # Hourly, daily and weekly age and gender counts kept up to date from the capture log and saved next to it.
+    # Range queries add up these rollups instead of reading captures.
+    def __init__(self, capture_log=None, path=None):
+        self.capture_log = capture_log or get_capture_log()
+        self.path = path or os.path.splitext(self.capture_log.path)[0] + "_counts.json"
+        self.lock = threading.Lock()
+
+        self.reset()
+        self.load()
+        self.refresh()
+
+    def reset(self):
+        self.hours = defaultdict(new_bucket)
+        self.days = defaultdict(new_bucket)
+        self.weeks = defaultdict(new_bucket)  # Derived from days, not saved
+        self.totals = new_bucket()
+        self.indexed_count = 0
+
+    def load(self):
+        # Resume from the saved counts; rebuild if they are from an older version or describe a longer log
+        try:
+            with open(self.path, "r") as counts_file:
+                saved = json.load(counts_file)
+        except (FileNotFoundError, JSONDecodeError):
+            return
+        if saved.get("version") != counts_version or saved.get("indexed_count", 0) > self.capture_log.count():
+            return
+
+        for key, bucket in saved.get("hours", {}).items():
+            self.merge(self.hours[key], bucket)
+        for day, bucket in saved.get("days", {}).items():
+            self.merge(self.days[day], bucket)
+            self.merge(self.weeks[week_of(day)], bucket)
+            self.merge(self.totals, bucket)
+        self.indexed_count = saved["indexed_count"]
+
+    def save(self):
+        saved = {"version": counts_version, "indexed_count": self.indexed_count, "days": self.days, "hours": self.hours}
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as counts_file:
+            json.dump(saved, counts_file)
+        os.replace(temp_path, self.path)
+
+    def merge(self, bucket, other):
+        bucket["age"].update(other["age"])
+        bucket["gender"].update(other["gender"])
+        bucket["total"] += other["total"]
+
+    def add(self, log_entry):
+        age = log_entry.get("Age", "")
+        gender = log_entry.get("Gender", "")
+        day = log_entry.get("Date", "")
+        buckets = [self.days[day], self.weeks[week_of(day)], self.totals]
+        hour = hour_key(log_entry)
+        if hour is not None:
+            buckets.append(self.hours[hour])
+        for counts in buckets:
+            counts["age"][age] += 1
+            counts["gender"][gender] += 1
+            counts["total"] += 1
+
+    def refresh(self):
+        # Fold in only the records appended since the last refresh
+        self.capture_log.refresh()
+        with self.lock:
+            count = self.capture_log.count()
+            if count == self.indexed_count:
+                return 0
+            new_entries = self.capture_log.read_range(self.indexed_count, count)
+            for log_entry in new_entries:
+                self.add(log_entry)
+            self.indexed_count = count
+            self.save()
+            return len(new_entries)
+
+    def counts(self, date="All"):
+        # (age counts, gender counts) for one day or for all history
+        if date == "All":
+            return self.query()
+        return self.query(date, date)
+
+    def query(self, start=None, end=None, hours=None):
+        # (age counts, gender counts) for days start..end (inclusive, "YYYY-MM-DD", None = open),
+        # optionally only for the hours (first, last) of each day
+        start, end = check_range(start, end)
+        total = new_bucket()
+        with self.lock:
+            for bucket in self.range_buckets(start, end, hours):
+                self.merge(total, bucket)
+        return total["age"], total["gender"]
+
+    def range_buckets(self, start, end, hours):
+        # Coarsest rollups that exactly cover the range: whole weeks, then the days around them
+        if hours is not None:
+            return [bucket for key, bucket in self.hours.items() if self.in_range(key[:10], start, end, key, hours)]
+        if start is None and end is None:
+            return [self.totals]
+        full_weeks = self.full_weeks(start, end)
+        buckets = [self.weeks[week] for week in full_weeks]
+        buckets += [bucket for day, bucket in self.days.items()
+                    if day and self.in_range(day, start, end) and week_of(day) not in full_weeks]
+        return buckets
+
+    def full_weeks(self, start, end):
+        # Weeks whose seven days all fall inside the range
+        return {week for week in self.weeks
+                if week and (start is None or week >= start)
+                and (end is None or (date.fromisoformat(week) + timedelta(days=6)).isoformat() <= end)}
+
+    def in_range(self, day, start, end, key=None, hours=None):
+        if (start is not None and day < start) or (end is not None and day > end):
+            return False
+        return hours is None or hours[0] <= int(key[11:13]) < hours[1]
+
+    def series(self, granularity="day", start=None, end=None, hours=None):
+        # [(bucket key, age counts, gender counts, total)] in time order, one entry per hour, day or week with captures
+        if granularity not in granularities:
+            raise ValueError(f"Unknown granularity: {granularity}")
+        start, end = check_range(start, end)
+        grouped = defaultdict(new_bucket)
+        with self.lock:
+            if hours is not None or granularity == "hour":
+                # Hour filters need the hourly rollups, regrouped to the requested granularity
+                group_key = {"hour": lambda key: key, "day": lambda key: key[:10], "week": lambda key: week_of(key[:10])}[granularity]
+                for key, bucket in self.hours.items():
+                    if self.in_range(key[:10], start, end, key, hours):
+                        self.merge(grouped[group_key(key)], bucket)
+            elif granularity == "day":
+                for day, bucket in self.days.items():
+                    if day and self.in_range(day, start, end):
+                        self.merge(grouped[day], bucket)
+            else:
+                # Weeks cut by the range fall back to their days
+                full_weeks = self.full_weeks(start, end)
+                for week in full_weeks:
+                    self.merge(grouped[week], self.weeks[week])
+                for day, bucket in self.days.items():
+                    if day and self.in_range(day, start, end) and week_of(day) not in full_weeks:
+                        self.merge(grouped[week_of(day)], bucket)
+        return [(key, bucket["age"], bucket["gender"], bucket["total"]) for key, bucket in sorted(grouped.items())]
+
+    def dates(self):
+        with self.lock:
+            return sorted(date for date in self.days if date)
+
+
+def export_csv(aggregates, output, granularity="day", start=None, end=None, hours=None):
+    # One row per rollup bucket with a column per gender and age range
+    rows = aggregates.series(granularity, start, end, hours)
+    genders = sorted({gender for _, _, gender_counts, _ in rows for gender in gender_counts})
+    ages = sorted({age for _, age_counts, _, _ in rows for age in age_counts})
+    with open(output, "w", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow([granularity, "Total"] + genders + ages)
+        for key, age_counts, gender_counts, total in rows:
+            writer.writerow([key, total] + [gender_counts[gender] for gender in genders] + [age_counts[age] for age in ages])
+    return len(rows)
+
+
+_capture_aggregates = None
+_capture_aggregates_lock = threading.Lock()
+
+
+def get_capture_aggregates():
+    global _capture_aggregates
+    with _capture_aggregates_lock:
+        if _capture_aggregates is None:
+            _capture_aggregates = CaptureAggregates()
+        return _capture_aggregates
+
+
+if __name__ == "__main__":
+    # Report export, e.g. weekly counts for a quarter between 10:00 and 14:00:
+    # python capture_aggregates.py --granularity week --from 2024-01-01 --to 2024-03-31 --hours 10-14
+    parser = argparse.ArgumentParser(description="Export hourly, daily or weekly capture counts as CSV")
+    parser.add_argument("--granularity", choices=granularities, default="day")
+    parser.add_argument("--from", dest="start", help="First date, YYYY-MM-DD")
+    parser.add_argument("--to", dest="end", help="Last date, YYYY-MM-DD")
+    parser.add_argument("--last-days", type=int, help="Instead of --from/--to")
+    parser.add_argument("--hours", type=parse_hours, help="Time of day, e.g. 10-14")
+    parser.add_argument("--output", default="capture_counts.csv")
+    args = parser.parse_args()
+
+    start, end = last_days(args.last_days) if args.last_days else (args.start, args.end)
+    try:
+        written = export_csv(get_capture_aggregates(), args.output, args.granularity, start, end, args.hours)
+    except ValueError as error:
+        parser.error(str(error))
+    print(f"{written} rows -> {args.output}")
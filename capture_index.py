@@ -0,0 +1,123 @@
+import bisect
+import threading
+from collections import defaultdict
+from datetime import datetime
+from capture_log import get_capture_log
+
+
+class CaptureIndex:
+    # In-memory index of the capture log keyed by image filename (one record per face), with secondary indexes on age, gender and date
+    def __init__(self, capture_log=None):
+        self.capture_log = capture_log or get_capture_log()
+        self.lock = threading.Lock()
+
+        self.records = {}
+        self.by_age = defaultdict(set)
+        self.by_gender = defaultdict(set)
+        self.by_date = defaultdict(set)
+        self.ordered = []  # (captured_at, filename), kept sorted
+        self.indexed_count = 0
+
+        self.refresh()
+
+    def refresh(self):
+        # Index only the records appended since the last refresh
+        self.capture_log.refresh()
+        with self.lock:
+            count = self.capture_log.count()
+            if count == self.indexed_count:
+                return 0
+            new_entries = self.capture_log.read_range(self.indexed_count, count)
+            for log_entry in new_entries:
+                self.add(log_entry)
+            self.indexed_count = count
+            return len(new_entries)
+
+    def add(self, log_entry):
+        # One record per face; an image with several faces is indexed under every face's age and gender
+        file_name = log_entry.get("Image Captured Filename")
+        if not file_name:
+            return
+        try:
+            captured_at = datetime.strptime(f"{log_entry['Date']} {log_entry['Time']}", '%Y-%m-%d %H:%M:%S')
+        except (KeyError, ValueError):
+            captured_at = datetime.min
+
+        self.by_age[log_entry.get("Age", "N/A")].add(file_name)
+        self.by_gender[log_entry.get("Gender", "N/A").lower()].add(file_name)
+        self.by_date[log_entry.get("Date", "")].add(file_name)
+
+        records = self.records.get(file_name)
+        if records is None:
+            self.records[file_name] = [(log_entry, captured_at)]
+        elif captured_at < records[0][1]:
+            # The earliest record gives the image its time; move it in the ordering
+            position = bisect.bisect_left(self.ordered, (records[0][1], file_name))
+            del self.ordered[position]
+            records.insert(0, (log_entry, captured_at))
+        else:
+            records.append((log_entry, captured_at))
+            return
+
+        # Captures arrive in time order, so this is almost always an append
+        item = (captured_at, file_name)
+        if not self.ordered or self.ordered[-1] <= item:
+            self.ordered.append(item)
+        else:
+            bisect.insort(self.ordered, item)
+
+    def get(self, file_name):
+        # The image's earliest log record
+        with self.lock:
+            records = self.records.get(file_name)
+        return records[0][0] if records else None
+
+    def captured_at(self, file_name):
+        with self.lock:
+            records = self.records.get(file_name)
+        return records[0][1] if records else datetime.min
+
+    def age_gender(self, file_name):
+        log_entry = self.get(file_name)
+        if log_entry is None:
+            return 'N/A', 'N/A'
+        return log_entry.get('Age', 'N/A'), log_entry.get('Gender', 'N/A')
+
+    def query(self, age="All", gender="All", date="All", reverse=False):
+        # Filenames matching every filter, ordered by capture time
+        with self.lock:
+            candidates = None
+            for value, index in ((age, self.by_age), (gender.lower(), self.by_gender), (date, self.by_date)):
+                if value.lower() == "all":
+                    continue
+                matches = index.get(value, set())
+                candidates = set(matches) if candidates is None else candidates & matches
+
+            if candidates is None:
+                ordered = [file_name for _, file_name in self.ordered]
+            else:
+                ordered = sorted(candidates, key=lambda file_name: (self.records[file_name][0][1], file_name))
+
+        if reverse:
+            ordered.reverse()
+        return ordered
+
+    def dates(self):
+        with self.lock:
+            return sorted(date for date, file_names in self.by_date.items() if date and file_names)
+
+    def __len__(self):
+        with self.lock:
+            return len(self.records)
+
+
+_capture_index = None
+_capture_index_lock = threading.Lock()
+
+
+def get_capture_index():
+    global _capture_index
+    with _capture_index_lock:
+        if _capture_index is None:
+            _capture_index = CaptureIndex()
+        return _capture_index
@@ -0,0 +1,268 @@
+import os
+import bisect
+import json
+import threading
+import time
+from json.decoder import JSONDecodeError
+
+
+class CaptureLog:
+    # Append-only JSON Lines store for capture records, one JSON object per line
+    def __init__(self, path="log.jsonl", legacy_path="log.json", fsync_every=20, fsync_interval=2.0):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+
+        self.lock = threading.Lock()
+        self.offsets = []  # Byte offset of every complete line
+        self.indexed_size = 0
+        self.pending_sync = 0
+        self.last_sync = time.monotonic()
+
+        self.migrate_legacy()
+        self.repair_tail()
+        self.file = open(self.path, "ab")
+        self.refresh()
+
+    def migrate_legacy(self):
+        # One-time import of the old log.json array; the new file appears atomically
+        if os.path.exists(self.path) or not self.legacy_path or not os.path.exists(self.legacy_path):
+            return
+        try:
+            with open(self.legacy_path, "r") as log_file:
+                log_json = json.load(log_file)
+        except JSONDecodeError:
+            log_json = []
+
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as temp_file:
+            for log_entry in log_json:
+                temp_file.write(json.dumps(log_entry) + "\n")
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        os.replace(temp_path, self.path)
+
+    def repair_tail(self):
+        # Drop a half-written last line left behind by a crash
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb+") as log_file:
+            log_file.seek(0, os.SEEK_END)
+            size = log_file.tell()
+            if size == 0:
+                return
+            log_file.seek(max(0, size - 65536))
+            tail = log_file.read()
+            if tail.endswith(b"\n"):
+                return
+            last_newline = tail.rfind(b"\n")
+            if last_newline < 0 and len(tail) < size:
+                return
+            keep = size - len(tail) + last_newline + 1 if last_newline >= 0 else 0
+            log_file.truncate(keep)
+
+    def refresh(self):
+        # Index lines appended since the last call, including those written by other processes
+        with self.lock:
+            return self.refresh_locked()
+
+    def refresh_locked(self):
+        new_entries = []
+        with open(self.path, "rb") as log_file:
+            log_file.seek(self.indexed_size)
+            offset = self.indexed_size
+            for line in log_file:
+                if not line.endswith(b"\n"):
+                    break
+                self.offsets.append(offset)
+                new_entries.append(self.decode(line))
+                offset += len(line)
+            self.indexed_size = offset
+        return [entry for entry in new_entries if entry is not None]
+
+    def decode(self, line):
+        try:
+            return json.loads(line)
+        except (JSONDecodeError, UnicodeDecodeError):
+            return None
+
+    def append(self, log_entry):
+        line = (json.dumps(log_entry) + "\n").encode("utf-8")
+        with self.lock:
+            # Pick up records another process appended so the offsets stay in file order
+            if os.fstat(self.file.fileno()).st_size != self.indexed_size:
+                self.refresh_locked()
+            self.file.write(line)
+            self.file.flush()
+            self.offsets.append(self.indexed_size)
+            self.indexed_size += len(line)
+
+            # Batch fsyncs: every fsync_every records or fsync_interval seconds
+            self.pending_sync += 1
+            if self.pending_sync >= self.fsync_every or time.monotonic() - self.last_sync >= self.fsync_interval:
+                self.sync_locked()
+
+    def sync(self):
+        with self.lock:
+            self.sync_locked()
+
+    def sync_locked(self):
+        if self.pending_sync:
+            os.fsync(self.file.fileno())
+        self.pending_sync = 0
+        self.last_sync = time.monotonic()
+
+    def close(self):
+        with self.lock:
+            if not self.file.closed:
+                self.sync_locked()
+                self.file.close()
+
+    def count(self):
+        with self.lock:
+            return len(self.offsets)
+
+    def read_range(self, start, stop):
+        # Read records [start, stop) by seeking to their offsets instead of parsing the whole file
+        with self.lock:
+            offsets = self.offsets[start:stop]
+        entries = []
+        with open(self.path, "rb") as log_file:
+            for offset in offsets:
+                log_file.seek(offset)
+                log_entry = self.decode(log_file.readline())
+                if log_entry is not None:
+                    entries.append(log_entry)
+        return entries
+
+    def read_at(self, positions):
+        # Read the records at arbitrary positions, in the given order
+        with self.lock:
+            offsets = [self.offsets[position] for position in positions]
+        entries = []
+        with open(self.path, "rb") as log_file:
+            for offset in offsets:
+                log_file.seek(offset)
+                entries.append(self.decode(log_file.readline()))
+        return entries
+
+    def iter_entries(self):
+        # Stream every record without holding the whole log in memory
+        with self.lock:
+            size = self.indexed_size
+        consumed = 0
+        with open(self.path, "rb") as log_file:
+            for line in log_file:
+                consumed += len(line)
+                if consumed > size:
+                    break
+                log_entry = self.decode(line)
+                if log_entry is not None:
+                    yield log_entry
+
+    def export_json(self, export_path="log.json"):
+        # Write the whole log as the legacy indented JSON array, atomically
+        temp_path = export_path + ".tmp"
+        with open(temp_path, "w") as export_file:
+            json.dump(list(self.iter_entries()), export_file, indent=4)
+            export_file.flush()
+            os.fsync(export_file.fileno())
+        os.replace(temp_path, export_path)
+
+
+class LogView:
+    # Sorted, paged view over the capture log that keeps only the sort keys in memory
+    sort_fields = {
+        "Date": ("Date", "Time"),
+        "Time": ("Time", "Date"),
+        "Gender": ("Gender", "Date", "Time"),
+        "Age": ("Age", "Date", "Time"),
+        "Image Captured Filename": ("Image Captured Filename",),
+    }
+
+    def __init__(self, capture_log, chunk_size=5000):
+        self.capture_log = capture_log
+        self.chunk_size = chunk_size
+        self.sort_column = None
+        self.reverse = False
+        self.sorted_keys = []  # (key, position) in ascending key order
+        self.keyed_count = 0
+
+    def count(self):
+        return self.capture_log.count()
+
+    def refresh(self):
+        # Pick up new records; a sorted view inserts their keys in place
+        self.capture_log.refresh()
+        if self.sort_column is not None:
+            self.add_keys(self.keyed_count, self.count())
+        return self.count()
+
+    def sort_key(self, log_entry):
+        fields = self.sort_fields[self.sort_column]
+        if log_entry is None:
+            return ("",) * len(fields)
+        return tuple(str(log_entry.get(field, "")) for field in fields)
+
+    def add_keys(self, start, stop):
+        for chunk_start in range(start, stop, self.chunk_size):
+            positions = range(chunk_start, min(chunk_start + self.chunk_size, stop))
+            for position, log_entry in zip(positions, self.capture_log.read_at(positions)):
+                item = (self.sort_key(log_entry), position)
+                if not self.sorted_keys or self.sorted_keys[-1] <= item:
+                    self.sorted_keys.append(item)
+                else:
+                    bisect.insort(self.sorted_keys, item)
+        self.keyed_count = stop
+
+    def sort(self, column, reverse=False):
+        # Sort on the stored values, not on formatted widget text
+        if column != self.sort_column:
+            self.sort_column = column
+            self.sorted_keys = []
+            self.keyed_count = 0
+            self.add_keys(0, self.count())
+        self.reverse = reverse
+
+    def positions(self, start, stop):
+        total = self.keyed_count if self.sort_column is not None else self.count()
+        start, stop = max(0, start), min(stop, total)
+        if start >= stop:
+            return []
+        if self.sort_column is None:
+            rows = range(start, stop)
+            return [total - 1 - row for row in rows] if self.reverse else list(rows)
+        if self.reverse:
+            return [self.sorted_keys[total - 1 - row][1] for row in range(start, stop)]
+        return [position for _, position in self.sorted_keys[start:stop]]
+
+    def page(self, start, stop):
+        # Records for rows [start, stop) of the current ordering
+        return self.capture_log.read_at(self.positions(start, stop))
+
+
+_capture_log = None
+_capture_log_lock = threading.Lock()
+
+
+def get_capture_log():
+    global _capture_log
+    with _capture_log_lock:
+        if _capture_log is None:
+            _capture_log = CaptureLog()
+        return _capture_log
+
+
+def close_capture_log():
+    global _capture_log
+    with _capture_log_lock:
+        if _capture_log is not None:
+            _capture_log.close()
+            _capture_log = None
+
+
+if __name__ == "__main__":
+    # Write log.json from the capture log for tools that still expect the old array format
+    get_capture_log().export_json()
+    close_capture_log()
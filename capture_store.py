@@ -0,0 +1,211 @@
+import os
+import re
+import json
+import shutil
+import argparse
+import threading
+from datetime import date, datetime, timedelta
+from json.decoder import JSONDecodeError
+from thumbnail_cache import get_thumbnail_cache
+
+# <age>_<gender>_<YYYYmmddHHMMSS>[_<camera>]_<number>.<ext>, as written by CaptureRecorder
+capture_filename = re.compile(r"^(?P<age>[^_]*)_(?P<gender>[^_]*)_(?P<timestamp>\d{14})(?:_(?P<camera>.+))?_(?P<number>\d+)\.\w+$")
+partition_date = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+image_extensions = ('.png', '.jpg', '.jpeg', '.gif', '.webp')
+default_camera = "default"
+
+
+def parse_filename(file_name):
+    # (date, camera, number) encoded in a capture filename, or None for other files
+    match = capture_filename.match(file_name)
+    if match is None:
+        return None
+    timestamp = match["timestamp"]
+    return f"{timestamp[:4]}-{timestamp[4:6]}-{timestamp[6:8]}", match["camera"] or default_camera, int(match["number"])
+
+
+class CaptureStore:
+    # Captures live in <root>/<YYYY-MM-DD>/<camera>/ with a manifest.jsonl per partition, so listing a
+    # date range reads only those manifests. File numbers come from one persisted counter and never repeat.
+    def __init__(self, root="captured_images", archive_folder="captured_archive", reserve=100):
+        self.root = root
+        self.archive_folder = archive_folder
+        self.reserve = reserve
+        self.sequence_path = os.path.join(root, "sequence.json")
+        self.lock = threading.Lock()
+
+        os.makedirs(self.root, exist_ok=True)
+        self.migrate_flat()
+        self.next_number = self.load_sequence()
+        self.reserved_until = self.next_number
+
+    def load_sequence(self):
+        try:
+            with open(self.sequence_path) as sequence_file:
+                return json.load(sequence_file)["next"]
+        except (FileNotFoundError, JSONDecodeError, KeyError):
+            # No counter yet: continue after the highest number already on disk
+            numbers = [entry["sequence"] for entry in self.list_images()]
+            return max(numbers, default=0) + 1
+
+    def save_sequence(self, next_number):
+        temp_path = self.sequence_path + ".tmp"
+        with open(temp_path, "w") as sequence_file:
+            json.dump({"next": next_number}, sequence_file)
+            sequence_file.flush()
+            os.fsync(sequence_file.fileno())
+        os.replace(temp_path, self.sequence_path)
+
+    def next_sequence(self):
+        # Numbers are reserved on disk in blocks: a crash skips at most one block, but never reuses a number
+        with self.lock:
+            if self.next_number >= self.reserved_until:
+                self.reserved_until = self.next_number + self.reserve
+                self.save_sequence(self.reserved_until)
+            number = self.next_number
+            self.next_number += 1
+            return number
+
+    def partition_path(self, day, camera=None):
+        return os.path.join(self.root, day, camera or default_camera)
+
+    def resolve(self, file_name):
+        # Where a capture is stored; flat files from before partitioning are still found
+        parsed = parse_filename(os.path.basename(file_name))
+        if parsed is not None:
+            image_path = os.path.join(self.partition_path(parsed[0], parsed[1]), os.path.basename(file_name))
+            if os.path.exists(image_path):
+                return image_path
+        return os.path.join(self.root, os.path.basename(file_name))
+
+    def add_to_manifest(self, image_path, entry):
+        # Called by the writer once the image is on disk
+        entry = dict(entry, file=os.path.basename(image_path))
+        with self.lock:
+            with open(os.path.join(os.path.dirname(image_path), "manifest.jsonl"), "a") as manifest_file:
+                manifest_file.write(json.dumps(entry) + "\n")
+
+    def partitions(self, start=None, end=None, camera=None):
+        # (date, camera, folder) for every partition in the date range; lists dates and cameras, not images
+        found = []
+        for day in sorted(os.listdir(self.root)):
+            if not partition_date.match(day) or (start and day < start) or (end and day > end):
+                continue
+            day_folder = os.path.join(self.root, day)
+            for partition_camera in sorted(os.listdir(day_folder)):
+                if camera is None or partition_camera == camera:
+                    found.append((day, partition_camera, os.path.join(day_folder, partition_camera)))
+        return found
+
+    def list_images(self, start=None, end=None, camera=None):
+        # Manifest entries with their image path, oldest first; loose images count as the default camera
+        entries = []
+        if camera in (None, default_camera):
+            entries += [entry for entry in self.loose_images()
+                        if not (start and entry["time"][:10] < start) and not (end and entry["time"][:10] > end)]
+        for _, _, folder in self.partitions(start, end, camera):
+            try:
+                with open(os.path.join(folder, "manifest.jsonl")) as manifest_file:
+                    lines = manifest_file.readlines()
+            except FileNotFoundError:
+                continue
+            for line in lines:
+                try:
+                    entry = json.loads(line)
+                except JSONDecodeError:
+                    continue  # Torn last line after a crash
+                entry["path"] = os.path.join(folder, entry["file"])
+                entries.append(entry)
+        entries.sort(key=lambda entry: (entry.get("time", ""), entry["sequence"]))
+        return entries
+
+    def loose_images(self):
+        # Images left in root because their names carry no capture time; dated by modification time
+        entries = []
+        for file_name in sorted(os.listdir(self.root)):
+            image_path = os.path.join(self.root, file_name)
+            if (file_name.lower().endswith(image_extensions) and capture_filename.match(file_name) is None
+                    and os.path.isfile(image_path)):
+                modified = datetime.fromtimestamp(os.path.getmtime(image_path))
+                entries.append({"sequence": 0, "time": modified.strftime("%Y-%m-%d %H:%M:%S"), "file": file_name,
+                                "path": image_path})
+        return entries
+
+    def dates(self):
+        days = {day for day in os.listdir(self.root) if partition_date.match(day)}
+        days.update(entry["time"][:10] for entry in self.loose_images())
+        return sorted(days)
+
+    def migrate_flat(self):
+        # Move captures saved flat in root (before partitioning) into their partitions, once. Images whose
+        # names do not say when they were captured stay in root, where resolve() finds them by name.
+        for file_name in sorted(os.listdir(self.root)):
+            image_path = os.path.join(self.root, file_name)
+            match = capture_filename.match(file_name)
+            if match is None or not file_name.lower().endswith(image_extensions) or not os.path.isfile(image_path):
+                continue
+            day, camera, number = parse_filename(file_name)
+            captured_at = datetime.strptime(match["timestamp"], "%Y%m%d%H%M%S")
+            entry = {"sequence": number, "time": captured_at.strftime("%Y-%m-%d %H:%M:%S"),
+                     "age": match["age"], "gender": match["gender"]}
+            partition = self.partition_path(day, camera)
+            os.makedirs(partition, exist_ok=True)
+            os.replace(image_path, os.path.join(partition, file_name))
+            self.add_to_manifest(os.path.join(partition, file_name), entry)
+
+    def apply_retention(self, keep_days, prune=False, today=None):
+        # Partitions older than keep_days are zipped into archive_folder (or deleted with prune) and removed.
+        # Loose images in root are not partitioned and are left alone.
+        # Capture log, index and count records are history and stay as they are; viewers treat the image as gone.
+        cutoff = ((today or date.today()) - timedelta(days=keep_days)).isoformat()
+        expired = sorted({day for day, _, _ in self.partitions() if day < cutoff})
+        thumbnails = get_thumbnail_cache()
+        for day in expired:
+            day_folder = os.path.join(self.root, day)
+            for _, _, folder in self.partitions(day, day):
+                for file_name in os.listdir(folder):
+                    if not file_name.lower().endswith(image_extensions):
+                        continue  # manifest.jsonl has no thumbnail
+                    try:
+                        os.remove(thumbnails.thumbnail_path(file_name))
+                    except FileNotFoundError:
+                        pass
+            if not prune:
+                os.makedirs(self.archive_folder, exist_ok=True)
+                shutil.make_archive(os.path.join(self.archive_folder, day), "zip", self.root, day)
+            shutil.rmtree(day_folder)
+        return expired
+
+
+_capture_stores = {}
+_capture_stores_lock = threading.Lock()
+
+
+def get_capture_store(root="captured_images"):
+    # One store per folder, so every recorder writing there shares the same counter
+    with _capture_stores_lock:
+        if root not in _capture_stores:
+            _capture_stores[root] = CaptureStore(root)
+        return _capture_stores[root]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Capture storage maintenance")
+    parser.add_argument("--root", default="captured_images")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    retention_parser = subparsers.add_parser("retention", help="Archive or delete partitions older than --keep-days")
+    retention_parser.add_argument("--keep-days", type=int, required=True)
+    retention_parser.add_argument("--prune", action="store_true", help="Delete instead of archiving")
+    list_parser = subparsers.add_parser("list", help="Captures in a date range")
+    list_parser.add_argument("--from", dest="start")
+    list_parser.add_argument("--to", dest="end")
+    list_parser.add_argument("--camera")
+    args = parser.parse_args()
+
+    store = get_capture_store(args.root)
+    if args.command == "retention":
+        expired = store.apply_retention(args.keep_days, args.prune)
+        print(f"{'Deleted' if args.prune else 'Archived'} {len(expired)} day(s): {', '.join(expired) or 'none'}")
+    else:
+        for entry in store.list_images(args.start, args.end, args.camera):
+            print(f"{entry['time']}  {entry['path']}")
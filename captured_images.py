@@ -1,9 +1,16 @@
 import os
-import json
 from datetime import datetime
 from PIL import Image, ImageTk
 import tkinter as tk
 from tkinter import ttk
+from tkinter import messagebox
+from capture_index import get_capture_index
+from thumbnail_cache import get_thumbnail_cache
+from capture_store import get_capture_store
+from capture_aggregates import last_days
+
+# Relative ranges offered above the individual capture dates
+range_presets = {"Last 7 days": 7, "Last 30 days": 30}
 
 class CapturedImagesTab(tk.Frame):
     def __init__(self, master, *args, **kwargs):
@@ -14,31 +21,46 @@ class CapturedImagesTab(tk.Frame):
         self.sort_order_var = tk.StringVar(value="Ascending")
         self.age_filter_var = tk.StringVar(value="All")
         self.gender_filter_var = tk.StringVar(value="All")
+        self.date_range_var = tk.StringVar(value="All")
+
+        # Only the partitions in the selected date range are listed
+        self.store = get_capture_store(self.images_folder)
+
+        # Metadata lookups go through the shared index instead of re-reading the log per image
+        self.index = get_capture_index()
+
+        # Cards render from cached thumbnails; a placeholder stands in until one is ready
+        self.thumbnails = get_thumbnail_cache()
+        self.placeholder = ImageTk.PhotoImage(Image.new("RGB", self.thumbnails.size, "#e0e0e0"))
+        self.pending_labels = {}
 
         self.load_images()
         self.create_widgets()
 
-    def load_images(self):
-        self.image_paths = [os.path.join(self.images_folder, filename) for filename in os.listdir(self.images_folder)
-                            if filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif'))]
+        # Stop polling for thumbnails when the tab is destroyed
+        self.bind("<Destroy>", self.on_destroy)
+        self.poll_thumbnails()
 
-        # Sort the image paths based on date and time from log.json
-        self.image_paths.sort(key=lambda path: self.get_datetime_from_log(path), reverse=False)
+    def load_images(self):
+        # Pick up captures logged since the index was last refreshed
+        self.index.refresh()
 
-    def get_datetime_from_log(self, path):
-        file_name = os.path.basename(path)
+        self.image_paths = [entry["path"] for entry in self.store.list_images(*self.selected_range())
+                            if entry["path"].lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.webp'))]
 
-        log_json_path = "log.json"
-        with open(log_json_path, 'r') as log_file:
-            log_json = json.load(log_file)
+        # Sort the image paths based on date and time from the capture log
+        self.image_paths.sort(key=lambda path: self.get_datetime_from_log(path), reverse=False)
 
-        for log_entry in log_json:
-            if log_entry["Image Captured Filename"] == file_name:
-                date_object = datetime.strptime(log_entry['Date'], '%Y-%m-%d')
-                formatted_time = datetime.strptime(log_entry['Time'], '%H:%M:%S').strftime('%I:%M %p')
-                return datetime.combine(date_object, datetime.strptime(formatted_time, '%I:%M %p').time())
+    def selected_range(self):
+        selected = self.date_range_var.get()
+        if selected == "All":
+            return None, None
+        if selected in range_presets:
+            return last_days(range_presets[selected])
+        return selected, selected
 
-        return datetime.min  # Return a default value (minimum datetime) in case of an error
+    def get_datetime_from_log(self, path):
+        return self.index.captured_at(os.path.basename(path))
 
     def create_widgets(self):
         # Your existing code to create the image frame
@@ -84,9 +106,18 @@ class CapturedImagesTab(tk.Frame):
         gender_dropdown.grid(row=0, column=7, padx=5)
         gender_dropdown.bind("<<ComboboxSelected>>", self.apply_filters)
 
+        # Filter by date range
+        date_label = tk.Label(self.pagination_sort_frame, text="Dates:", bg="white")
+        date_label.grid(row=0, column=8, padx=(20, 5))
+
+        date_options = ["All"] + list(range_presets) + self.store.dates()
+        date_dropdown = ttk.Combobox(self.pagination_sort_frame, textvariable=self.date_range_var, values=date_options)
+        date_dropdown.grid(row=0, column=9, padx=5)
+        date_dropdown.bind("<<ComboboxSelected>>", self.apply_filters)
+
         # Clear filters and sorting button
         clear_button = ttk.Button(self.pagination_sort_frame, text="Clear Filters", command=self.clear_filters)
-        clear_button.grid(row=0, column=8, padx=5)
+        clear_button.grid(row=0, column=10, padx=5)
 
     def show_images(self):
         # Clear existing images
@@ -118,39 +149,29 @@ class CapturedImagesTab(tk.Frame):
                 file_name = os.path.basename(self.image_paths[i])
 
                 image_path = self.image_paths[i]
-                image = Image.open(image_path)
-                image = image.resize((200, 200))  # Adjust the size as needed
-
-                photo = ImageTk.PhotoImage(image)
+                photo = self.thumbnails.get_photo(image_path)
                 card_frame = tk.Frame(inner_frame, bg="white", highlightbackground="gray", highlightthickness=1)
 
-                label_image = tk.Label(card_frame, image=photo, bg="white")
+                label_image = tk.Label(card_frame, image=photo or self.placeholder, bg="white")
                 label_image.image = photo
+                if photo is None:
+                    self.pending_labels[image_path] = label_image
 
                 # Double-click event binding for image preview
                 label_image.bind("<Double-1>", lambda event, path=image_path: self.show_image_popup(path))
 
                 label_image.grid(row=0, column=0, sticky='nsew')
 
-                # Display information from log.json
-                log_json_path = "log.json"
-                with open(log_json_path, 'r') as log_file:
-                    log_json = json.load(log_file)
-
-                for log_entry in log_json:
-                    if log_entry["Image Captured Filename"] == file_name:
-                        date_object = datetime.strptime(log_entry['Date'], '%Y-%m-%d')
-                        formatted_date = date_object.strftime('%m/%d/%Y')
-                        formatted_time = datetime.strptime(log_entry['Time'], '%H:%M:%S').strftime('%I:%M %p')
-                        info_label_text = f"Date: {formatted_date} \nTime: {formatted_time}"
-
-                        info_label = tk.Label(card_frame, text=info_label_text, wraplength=200, justify=tk.LEFT, bg="white")
-                        info_label.grid(row=1, column=0, pady=(5, 10), sticky='w')
-
-                        # Update the label configuration with the new text
-                        info_label.config(text=f"Date: {formatted_date} \nTime: {formatted_time}")
+                # Display information from the capture log
+                log_entry = self.index.get(file_name)
+                if log_entry is not None:
+                    date_object = datetime.strptime(log_entry['Date'], '%Y-%m-%d')
+                    formatted_date = date_object.strftime('%m/%d/%Y')
+                    formatted_time = datetime.strptime(log_entry['Time'], '%H:%M:%S').strftime('%I:%M %p')
+                    info_label_text = f"Date: {formatted_date} \nTime: {formatted_time}"
 
-                        break  # Break out of the loop once information is found
+                    info_label = tk.Label(card_frame, text=info_label_text, wraplength=200, justify=tk.LEFT, bg="white")
+                    info_label.grid(row=1, column=0, pady=(5, 10), sticky='w')
 
                 card_frame.grid(row=(i - start_index) // 5, column=(i - start_index) % 5, padx=10, pady=10, sticky='nsew')
 
@@ -176,9 +197,25 @@ class CapturedImagesTab(tk.Frame):
             self.show_images()
 
     def clear_images(self):
+        self.pending_labels = {}
         for widget in self.image_frame.winfo_children():
             widget.destroy()
 
+    def poll_thumbnails(self):
+        # Swap placeholders for thumbnails finished by the background workers
+        for image_path in self.thumbnails.completed():
+            label_image = self.pending_labels.pop(image_path, None)
+            if label_image is not None and label_image.winfo_exists():
+                photo = self.thumbnails.get_photo(image_path)
+                if photo is not None:
+                    label_image.config(image=photo)
+                    label_image.image = photo
+        self.poll_id = self.after(100, self.poll_thumbnails)
+
+    def on_destroy(self, event):
+        if event.widget is self and hasattr(self, "poll_id"):
+            self.after_cancel(self.poll_id)
+
     def show_image_popup(self, image_path):
         try:
             image = Image.open(image_path)
@@ -211,11 +248,12 @@ class CapturedImagesTab(tk.Frame):
             image_popup.resizable(False, False)
             image_popup.attributes("-toolwindow", 1)
 
-        except FileNotFoundError:
-            tk.messagebox.showerror("Error", f"Image not found: {image_path}")
+        except OSError:
+            # Missing (e.g. archived or pruned by retention) or unreadable
+            messagebox.showerror("Error", f"Image not available (archived or deleted?): {image_path}")
 
     def sort_images(self, event=None):
-        # Sort the image paths based on date and time from log.json and the selected sort order
+        # Sort the image paths based on date and time from the capture log and the selected sort order
         reverse_order = self.sort_order_var.get() == "Descending"
         self.image_paths.sort(key=lambda path: self.get_datetime_from_log(path), reverse=reverse_order)
 
@@ -233,36 +271,21 @@ class CapturedImagesTab(tk.Frame):
         age_filter = self.age_filter_var.get()
         gender_filter = self.gender_filter_var.get()
 
-        filtered_paths = []
-
-        for path in self.image_paths:
-            file_name = os.path.basename(path)
-            age, gender = self.get_age_gender_from_log(file_name)
-
-            # Apply filters
-            if (age_filter == "All" or age_filter == age) and (gender_filter == "All" or gender_filter.lower() == gender.lower()):
-                filtered_paths.append(path)
+        if age_filter == "All" and gender_filter == "All":
+            return
 
-        # Update image paths with filtered paths
-        self.image_paths = filtered_paths
+        # Answer the filter from the secondary indexes
+        matching = set(self.index.query(age=age_filter, gender=gender_filter))
+        self.image_paths = [path for path in self.image_paths if os.path.basename(path) in matching]
 
     def get_age_gender_from_log(self, file_name):
-        log_json_path = "log.json"
-        with open(log_json_path, 'r') as log_file:
-            log_json = json.load(log_file)
-
-        for log_entry in log_json:
-            if log_entry["Image Captured Filename"] == file_name:
-                age = log_entry.get('Age', 'N/A')
-                gender = log_entry.get('Gender', 'N/A')
-                return age, gender
-
-        return 'N/A', 'N/A'
+        return self.index.age_gender(file_name)
 
     def clear_filters(self):
         # Clear all filters and sorting
         self.age_filter_var.set("All")
         self.gender_filter_var.set("All")
+        self.date_range_var.set("All")
         self.sort_order_var.set("Ascending")
 
         # Reload images and show
@@ -0,0 +1,99 @@
+import argparse
+import os
+import random
+import tempfile
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from capture_log import CaptureLog
+from capture_aggregates import CaptureAggregates, granularities, week_of
+import inference
+
+
+def synthetic_log(path, records, days, seed):
+    # Random captures over the last `days` days, written through CaptureLog like the app does
+    rng = random.Random(seed)
+    first_day = date(2024, 1, 1)
+    capture_log = CaptureLog(path=path, legacy_path=None)
+    entries = []
+    for _ in range(records):
+        day = (first_day + timedelta(days=rng.randrange(days))).isoformat()
+        entry = {"Date": day, "Time": f"{rng.randrange(24):02d}:{rng.randrange(60):02d}:{rng.randrange(60):02d}",
+                 "Age": rng.choice(inference.ageList), "Gender": rng.choice(inference.genderList),
+                 "Image Captured Filename": f"{len(entries)}.png"}
+        capture_log.append(entry)
+        entries.append(entry)
+    capture_log.close()
+    return entries, first_day
+
+
+def brute_force(entries, start, end, hours, granularity=None):
+    # The same counts straight from the records: {bucket key: (age counts, gender counts)}
+    grouped = defaultdict(lambda: (Counter(), Counter()))
+    for entry in entries:
+        day, hour = entry["Date"], int(entry["Time"][:2])
+        if (start and day < start) or (end and day > end) or (hours and not hours[0] <= hour < hours[1]):
+            continue
+        key = {None: None, "hour": f"{day} {hour:02d}", "day": day, "week": week_of(day)}[granularity]
+        grouped[key][0][entry["Age"]] += 1
+        grouped[key][1][entry["Gender"]] += 1
+    return grouped
+
+
+def random_range(rng, first_day, days):
+    # Open ends, single days, week-aligned and cut weeks all come up
+    start = first_day + timedelta(days=rng.randrange(-3, days))
+    end = start + timedelta(days=rng.randrange(0, 40))
+    hours = None
+    if rng.random() < 0.3:
+        first = rng.randrange(24)
+        hours = (first, rng.randrange(first + 1, 25))
+    return (None if rng.random() < 0.1 else start.isoformat()), (None if rng.random() < 0.1 else end.isoformat()), hours
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare rollup range queries against a brute-force count over a synthetic log")
+    parser.add_argument("--records", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=120)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        entries, first_day = synthetic_log(os.path.join(folder, "log.jsonl"), args.records, args.days, args.seed)
+        capture_log = CaptureLog(path=os.path.join(folder, "log.jsonl"), legacy_path=None)
+        CaptureAggregates(capture_log)  # Builds and saves the rollups
+        # A second instance resumes from the saved rollups, which is what the app does on restart
+        aggregates = CaptureAggregates(capture_log)
+
+        rng = random.Random(args.seed)
+        failures = 0
+        for _ in range(args.queries):
+            start, end, hours = random_range(rng, first_day, args.days)
+            expected = brute_force(entries, start, end, hours).get(None, (Counter(), Counter()))
+            if aggregates.query(start, end, hours) != expected:
+                failures += 1
+                print(f"query mismatch: {start}..{end} hours {hours}")
+            granularity = rng.choice(granularities)
+            expected = brute_force(entries, start, end, hours, granularity)
+            series = {key: (age_counts, gender_counts) for key, age_counts, gender_counts, _ in
+                      aggregates.series(granularity, start, end, hours)}
+            if series != dict(expected):
+                failures += 1
+                print(f"{granularity} series mismatch: {start}..{end} hours {hours}")
+
+        for start, end in (("2024-02-10", "2024-02-01"), ("2024-13-01", None), ("yesterday", None)):
+            try:
+                aggregates.query(start, end)
+            except ValueError:
+                continue
+            failures += 1
+            print(f"no error for the range {start}..{end}")
+        capture_log.close()
+
+    print(f"{args.queries} random ranges over {args.records} records: {failures} failure(s)")
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
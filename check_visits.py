@@ -0,0 +1,86 @@
+import argparse
+import os
+import tempfile
+from datetime import datetime, timedelta
+import numpy as np
+import capture
+from capture import CaptureRecorder
+from capture_log import CaptureLog
+from thumbnail_cache import get_thumbnail_cache
+from tracking import TrackingAnalyzer
+
+
+class StubAnalyzer(TrackingAnalyzer):
+    # TrackingAnalyzer with scripted detections and a fixed label instead of the networks
+    def __init__(self, script, detect_every=3):
+        super().__init__(object(), object(), object(), detect_every=detect_every)
+        self.script = script
+
+    def detect(self, frame):
+        return frame, [list(bbox) for bbox in self.script(self.frame_index)]
+
+    def classify(self, crops):
+        return [("21-25", "Male")] * len(crops)
+
+
+class SteppedClock:
+    # Stands in for datetime in capture.py so every analyzed frame advances the time by one frame
+    current = datetime(2024, 1, 1, 12, 0, 0)
+
+    @classmethod
+    def now(cls):
+        return cls.current
+
+
+def run_visits(visits, frames, fps, folder):
+    # visits: [(first frame, last frame, bbox)]; returns the capture log records
+    def script(frame_index):
+        return [bbox for first, last, bbox in visits if first <= frame_index <= last]
+
+    os.makedirs(folder)
+    capture_log = CaptureLog(path=os.path.join(folder, "log.jsonl"), legacy_path=None)
+    recorder = CaptureRecorder(output_folder=os.path.join(folder, "images"), capture_log=capture_log)
+    analyzer = StubAnalyzer(script)
+    frame = np.zeros((240, 320, 3), dtype=np.uint8)
+    for _ in range(frames):
+        SteppedClock.current += timedelta(seconds=1 / fps)
+        _, faces = analyzer.analyze(frame.copy())
+        recorder.maybe_capture(frame, faces)
+    recorder.close()
+    records = list(capture_log.iter_entries())
+    capture_log.close()
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that tracked visits are logged exactly once, however short")
+    parser.add_argument("--fps", type=float, default=30.0)
+    args = parser.parse_args()
+
+    capture.datetime = SteppedClock
+    left, right = (20, 20, 80, 100), (200, 20, 260, 100)
+    cases = [
+        ("10-frame visit", [(1, 10, left)], 80, 1),
+        ("60-frame visit", [(1, 60, left)], 120, 1),
+        ("two short visits at once", [(1, 8, left), (1, 8, right)], 80, 2),
+        ("visit still going at close", [(1, 10, left)], 10, 1),
+        ("two visits one after the other", [(1, 10, left), (70, 80, right)], 150, 2),
+    ]
+    failures = 0
+    working_folder = os.getcwd()
+    with tempfile.TemporaryDirectory() as folder:
+        os.chdir(folder)  # Thumbnails go next to the scratch logs
+        for index, (name, visits, frames, expected) in enumerate(cases):
+            records = run_visits(visits, frames, args.fps, os.path.join(folder, str(index)))
+            status = "ok" if len(records) == expected else "FAIL"
+            failures += status == "FAIL"
+            print(f"{name:>32}: {len(records)} record(s), expected {expected}  {status}")
+        get_thumbnail_cache().executor.shutdown(wait=True)  # Let queued thumbnails finish before the folder goes
+        os.chdir(working_folder)
+
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import os
+import json
+import time
+import platform
+import cv2
+import numpy as np
+import inference
+
+# name -> (backend attribute, target attribute); entries missing from this OpenCV build are skipped
+dnn_backend_names = {
+    "opencv-cpu": ("DNN_BACKEND_OPENCV", "DNN_TARGET_CPU"),
+    "openvino-cpu": ("DNN_BACKEND_INFERENCE_ENGINE", "DNN_TARGET_CPU"),
+    "opencl": ("DNN_BACKEND_OPENCV", "DNN_TARGET_OPENCL"),
+    "cuda": ("DNN_BACKEND_CUDA", "DNN_TARGET_CUDA"),
+}
+
+# Input blob shape used to time each network
+network_inputs = {
+    "face": (1, 3, 227, 227),
+    "age": (1, 3, 227, 227),
+    "gender": (1, 3, 227, 227),
+}
+
+
+def resolve_backend(name):
+    backend_attr, target_attr = dnn_backend_names[name]
+    if not hasattr(cv2.dnn, backend_attr) or not hasattr(cv2.dnn, target_attr):
+        return None
+    return getattr(cv2.dnn, backend_attr), getattr(cv2.dnn, target_attr)
+
+
+def available_backends():
+    # Backend/target pairs this OpenCV build reports as usable
+    names = []
+    for name in dnn_backend_names:
+        resolved = resolve_backend(name)
+        if resolved is None:
+            continue
+        backend, target = resolved
+        try:
+            if target in cv2.dnn.getAvailableTargets(backend):
+                names.append(name)
+        except cv2.error:
+            continue
+    return names or ["opencv-cpu"]
+
+
+def configure_network(net, backend="opencv-cpu"):
+    resolved = resolve_backend(backend)
+    if resolved is not None:
+        net.setPreferableBackend(resolved[0])
+        net.setPreferableTarget(resolved[1])
+    return net
+
+
+def apply_settings(settings):
+    # cv2.setNumThreads is process-wide; OpenCV has no per-network thread count
+    if settings.get("threads"):
+        cv2.setNumThreads(settings["threads"])
+
+
+def load_networks(settings, variant="caffe-fp32"):
+    # Face, age and gender networks on their selected backends
+    apply_settings(settings)
+    return tuple(configure_network(inference.read_network(network, variant), settings.get(network, "opencv-cpu"))
+                 for network in ("face", "age", "gender"))
+
+
+def time_network(network, backend, repeats=5):
+    # Median forward time in ms, or None when the backend cannot run this network
+    net = configure_network(inference.read_network(network), backend)
+    blob = np.random.default_rng(0).random(network_inputs[network], dtype=np.float32) * 255
+    try:
+        net.setInput(blob)
+        net.forward()  # Warm-up; the first call also compiles/initializes the backend
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            net.setInput(blob)
+            net.forward()
+            timings.append((time.perf_counter() - start) * 1000)
+    except cv2.error:
+        return None
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+def host_signature():
+    return {"opencv": cv2.__version__, "machine": platform.machine(), "processor": platform.processor(), "cpus": os.cpu_count()}
+
+
+def self_benchmark(thread_options=None, repeats=5):
+    # Time every network on every available backend and thread count; keep the fastest of each
+    cpus = os.cpu_count() or 1
+    thread_options = thread_options or sorted({cpus, max(1, cpus // 2)}, reverse=True)
+    backends = available_backends()
+    timings = {network: {} for network in network_inputs}
+    best_threads, best_total = None, None
+
+    for threads in thread_options:
+        cv2.setNumThreads(threads)
+        total = 0.0
+        for network in network_inputs:
+            for backend in backends:
+                elapsed = time_network(network, backend, repeats)
+                timings[network][f"{backend}@{threads}"] = elapsed
+            elapsed = min((value for key, value in timings[network].items() if key.endswith(f"@{threads}") and value is not None),
+                          default=None)
+            total += elapsed if elapsed is not None else float("inf")
+        if best_total is None or total < best_total:
+            best_threads, best_total = threads, total
+
+    settings = {"threads": best_threads}
+    for network in network_inputs:
+        candidates = {key.split("@")[0]: value for key, value in timings[network].items()
+                      if key.endswith(f"@{best_threads}") and value is not None}
+        settings[network] = min(candidates, key=candidates.get) if candidates else "opencv-cpu"
+    return settings, timings
+
+
+def load_record(record_path):
+    # The recorded choice, or None when there is none or it cannot be used (e.g. a bad hand edit)
+    try:
+        with open(record_path) as record_file:
+            record = json.load(record_file)
+        settings = record["settings"]
+        if settings.get("threads") is not None and not isinstance(settings["threads"], int):
+            raise ValueError(f"threads must be a number, not {settings['threads']!r}")
+        for network in network_inputs:
+            dnn_backend_names[settings.get(network, "opencv-cpu")]
+    except FileNotFoundError:
+        return None
+    except (ValueError, KeyError, TypeError, AttributeError) as error:
+        print(f"Discarding {record_path}: {error!r}")
+        return None
+    return record
+
+
+def select_dnn_settings(record_path="dnn_backend.json", force=False):
+    # Reuse the recorded choice on the same host and OpenCV build; otherwise benchmark and record it.
+    # Setting "pinned": true in the record keeps hand-edited settings regardless of host.
+    record = None if force else load_record(record_path)
+    if record is not None and (record.get("pinned") or record.get("host") == host_signature()):
+        return record["settings"]
+
+    try:
+        settings, timings = self_benchmark()
+    except cv2.error as error:
+        # Models missing or unreadable: fall back to OpenCV's defaults and do not record anything
+        print(f"DNN self-benchmark skipped: {error}")
+        return {"threads": None, "face": "opencv-cpu", "age": "opencv-cpu", "gender": "opencv-cpu"}
+
+    record = {"host": host_signature(), "settings": settings, "timings_ms": timings,
+              "recorded": time.strftime("%Y-%m-%d %H:%M:%S")}
+    with open(record_path, "w") as record_file:
+        json.dump(record, record_file, indent=4)
+    print(f"DNN backend selected: {settings}")
+    return settings
+
+
+if __name__ == "__main__":
+    print(json.dumps(select_dnn_settings(force=True), indent=4))
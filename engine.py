@@ -0,0 +1,74 @@
+import os
+import threading
+from dnn_backend import load_networks, select_dnn_settings
+from tracking import TrackingAnalyzer
+from capture import CaptureRecorder
+from video_pipeline import VideoPipeline
+from profiling import get_profiler, MetricsDumper
+from api_server import ApiServer
+
+
+class InferenceEngine:
+    # Owns the networks and the camera for the lifetime of the process
+    def __init__(self, source=0, variant="caffe-fp32", metrics_path=None, metrics_interval=10.0, api_port=None):
+        # Backends and thread count come from the recorded startup self-benchmark
+        self.dnn_settings = select_dnn_settings()
+        self.faceNet, self.ageNet, self.genderNet = load_networks(self.dnn_settings, variant)
+        self.analyzer = TrackingAnalyzer(self.faceNet, self.ageNet, self.genderNet, variant=variant)
+        self.recorder = CaptureRecorder()
+        self.pipeline = VideoPipeline(self.analyzer, self.recorder, source)
+        # Optional periodic dump of stage timings and pipeline counters for profiling deployed machines
+        self.metrics_dumper = MetricsDumper(self.metrics, metrics_path, metrics_interval) if metrics_path else None
+        # Optional localhost API streaming detections to dashboards
+        self.api_server = None
+        if api_port:
+            self.api_server = ApiServer(self.pipeline, port=api_port, image_folder=self.recorder.output_folder)
+            self.pipeline.add_listener(self.api_server.on_pipeline_event)
+            self.api_server.start()
+
+    def start(self):
+        # Safe to call on every tab switch; the pipeline only starts once
+        self.pipeline.start()
+        return self.pipeline
+
+    def set_profile(self, profile):
+        # Switch the detector speed/accuracy profile; takes effect on the next frame
+        self.analyzer.profile = profile
+
+    def metrics(self):
+        return {"pipeline": self.pipeline.stats(), "profile": get_profiler().summary()}
+
+    def shutdown(self):
+        self.pipeline.stop()
+        # Flush captures still waiting in the writer queue
+        self.recorder.close()
+        if self.metrics_dumper is not None:
+            self.metrics_dumper.close()
+        if self.api_server is not None:
+            self.api_server.stop()
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            # CLASSIFIER_VARIANT picks the age/gender models (see classifier_variants.json),
+            # METRICS_PATH (and METRICS_INTERVAL seconds) turn on the periodic metrics dump, API_PORT the localhost API
+            _engine = InferenceEngine(variant=os.environ.get("CLASSIFIER_VARIANT", "caffe-fp32"),
+                                      metrics_path=os.environ.get("METRICS_PATH"),
+                                      metrics_interval=float(os.environ.get("METRICS_INTERVAL", 10)),
+                                      api_port=int(os.environ.get("API_PORT", 0)) or None)
+        return _engine
+
+
+def shutdown_engine():
+    # Release the camera and stop the worker threads, if the engine was ever created
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.shutdown()
+            _engine = None
@@ -0,0 +1,318 @@
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import time
+import numpy as np
+import cv2
+import inference
+from dnn_backend import host_signature, load_networks, select_dnn_settings
+
+stages = ("decode", "detect", "classify", "total")
+
+
+def iter_age_dataset(dataset_folder="dataset"):
+    # (image path, age bucket) from the dataset/<"11 - 15">/<age>/ layout
+    for bucket_folder in sorted(os.listdir(dataset_folder)):
+        bucket = bucket_folder.replace(" ", "")
+        if bucket not in inference.ageList:
+            continue
+        for path in sorted(glob.glob(os.path.join(dataset_folder, bucket_folder, "*", "*"))):
+            yield path, bucket
+
+
+def load_samples(dataset_folder="dataset", limit=None):
+    # Age comes from the folder; gender only when dataset/genders.json maps "11 - 15/11/11.jpg" -> "Male"/"Female"
+    genders_path = os.path.join(dataset_folder, "genders.json")
+    genders = {}
+    if os.path.exists(genders_path):
+        with open(genders_path) as genders_file:
+            genders = json.load(genders_file)
+    samples = []
+    for path, bucket in iter_age_dataset(dataset_folder):
+        key = os.path.relpath(path, dataset_folder).replace(os.sep, "/")
+        samples.append({"path": path, "age": bucket, "gender": genders.get(key)})
+    return samples[:limit]
+
+
+def largest_box(bboxs):
+    return max(bboxs, key=lambda box: (box[2] - box[0]) * (box[3] - box[1]))
+
+
+def largest_face(faceNet, frame, profile="accurate"):
+    # Crop of the biggest detected face, or the whole image when the detector finds none
+    bboxs, _ = inference.detect_faces(faceNet, frame, profile)
+    if not bboxs:
+        return frame
+    y1, y2, x1, x2 = inference.crop_windows([largest_box(bboxs)], frame.shape)[0]
+    return frame[y1:y2, x1:x2]
+
+
+def percentiles(timings):
+    if not timings:
+        return None
+    timings = np.asarray(timings)
+    return {"p50": round(float(np.percentile(timings, 50)), 3), "p95": round(float(np.percentile(timings, 95)), 3),
+            "p99": round(float(np.percentile(timings, 99)), 3), "mean": round(float(timings.mean()), 3)}
+
+
+def confusion_report(confusion, labels):
+    # Rows are the labeled class, columns the prediction; the last column counts images with no face found
+    confusion = np.asarray(confusion)
+    labeled = confusion.sum()
+    hits = np.trace(confusion[:, :len(labels)])
+    near = sum(confusion[i, j] for i in range(len(labels)) for j in range(len(labels)) if abs(i - j) <= 1)
+    return {"labels": labels + ["no face"], "confusion": confusion.tolist(), "samples": int(labeled),
+            "accuracy": round(float(hits / labeled), 4) if labeled else None,
+            "within_one": round(float(near / labeled), 4) if labeled else None}
+
+
+def analyze_sample(networks, path, profile, input_size):
+    # Decode, detect and classify the largest face of one image with per-stage timers:
+    # (faces found or None when unreadable, (age, gender) or None, {stage: ms})
+    faceNet, ageNet, genderNet = networks
+    timing = {}
+    image_start = time.perf_counter()
+    frame = cv2.imread(path)
+    decoded = time.perf_counter()
+    timing["decode"] = (decoded - image_start) * 1000
+    if frame is None:
+        return None, None, timing
+
+    bboxs, _ = inference.detect_faces(faceNet, frame, profile)
+    detected_at = time.perf_counter()
+    timing["detect"] = (detected_at - decoded) * 1000
+    if not bboxs:
+        timing["total"] = (detected_at - image_start) * 1000
+        return 0, None, timing
+
+    # The dataset has one labeled face per image; score the largest detection
+    y1, y2, x1, x2 = inference.crop_windows([largest_box(bboxs)], frame.shape)[0]
+    prediction = inference.classify_face(ageNet, genderNet, frame[y1:y2, x1:x2], input_size)
+    finished = time.perf_counter()
+    timing["classify"] = (finished - detected_at) * 1000
+    timing["total"] = (finished - image_start) * 1000
+    return len(bboxs), prediction, timing
+
+
+def add_timing(timings, timing):
+    for stage, elapsed in timing.items():
+        timings[stage].append(elapsed)
+
+
+def run_single(faceNet, ageNet, genderNet, samples, profile, input_size):
+    # One image at a time with per-stage timers; its predictions feed the confusion matrices
+    timings = {stage: [] for stage in stages}
+    age_confusion = np.zeros((len(inference.ageList), len(inference.ageList) + 1), dtype=int)
+    gender_confusion = np.zeros((len(inference.genderList), len(inference.genderList) + 1), dtype=int)
+    predicted_genders = dict.fromkeys(inference.genderList, 0)
+    predictions = []
+    detected = faces = 0
+
+    start = time.perf_counter()
+    for sample in samples:
+        found, prediction, timing = analyze_sample((faceNet, ageNet, genderNet), sample["path"], profile, input_size)
+        add_timing(timings, timing)
+        predictions.append(prediction)
+        if found is None:
+            continue
+        faces += found
+
+        age_row = inference.ageList.index(sample["age"])
+        gender_row = inference.genderList.index(sample["gender"]) if sample["gender"] in inference.genderList else None
+        if prediction is None:
+            age_confusion[age_row, -1] += 1
+            if gender_row is not None:
+                gender_confusion[gender_row, -1] += 1
+            continue
+
+        detected += 1
+        age, gender = prediction
+        age_confusion[age_row, inference.ageList.index(age)] += 1
+        predicted_genders[gender] += 1
+        if gender_row is not None:
+            gender_confusion[gender_row, inference.genderList.index(gender)] += 1
+    elapsed = time.perf_counter() - start
+
+    report = {
+        "detection": {"images": len(samples), "with_face": detected, "faces": faces,
+                      "recall": round(detected / len(samples), 4) if samples else None},
+        "age": confusion_report(age_confusion, list(inference.ageList)),
+        "gender": confusion_report(gender_confusion, list(inference.genderList)),
+        "predicted_genders": predicted_genders,
+    }
+    report["gender"].pop("within_one")
+    return report, predictions, timings, len(samples) / elapsed if elapsed else 0.0
+
+
+def run_batched(faceNet, ageNet, genderNet, samples, profile, input_size, batch_size):
+    # Detect per image, then classify the largest faces of batch_size images in one forward pass per network.
+    # "classify" is timed per batch; an image's "total" runs until its batch has been classified.
+    timings = {stage: [] for stage in stages}
+    predictions = []
+    pending = []
+    start = time.perf_counter()
+    for sample in samples:
+        image_start = time.perf_counter()
+        frame = cv2.imread(sample["path"])
+        decoded = time.perf_counter()
+        timings["decode"].append((decoded - image_start) * 1000)
+        if frame is None:
+            predictions.append(None)
+            continue
+        bboxs, _ = inference.detect_faces(faceNet, frame, profile)
+        detected_at = time.perf_counter()
+        timings["detect"].append((detected_at - decoded) * 1000)
+        predictions.append(None)
+        if not bboxs:
+            timings["total"].append((detected_at - image_start) * 1000)
+            continue
+        y1, y2, x1, x2 = inference.crop_windows([largest_box(bboxs)], frame.shape)[0]
+        pending.append((len(predictions) - 1, frame[y1:y2, x1:x2], image_start))
+        if len(pending) >= batch_size:
+            classify_pending(ageNet, genderNet, pending, predictions, input_size, timings)
+    classify_pending(ageNet, genderNet, pending, predictions, input_size, timings)
+    elapsed = time.perf_counter() - start
+    return predictions, timings, len(samples) / elapsed if elapsed else 0.0
+
+
+def classify_pending(ageNet, genderNet, pending, predictions, input_size, timings):
+    if not pending:
+        return
+    batch_start = time.perf_counter()
+    results = inference.classify_faces(ageNet, genderNet, [face for _, face, _ in pending], input_size)
+    finished = time.perf_counter()
+    timings["classify"].append((finished - batch_start) * 1000)
+    for (index, _, image_start), result in zip(pending, results):
+        predictions[index] = result
+        timings["total"].append((finished - image_start) * 1000)
+    pending.clear()
+
+
+worker_networks = None
+
+
+def init_worker(profile, variant, dnn_settings, warmup_path=None):
+    # Each worker process loads its own networks and warms them up like the parent does
+    global worker_networks
+    worker_networks = load_networks(dnn_settings, variant)
+    warmup = cv2.imread(warmup_path) if warmup_path else None
+    if warmup is not None:
+        faceNet, ageNet, genderNet = worker_networks
+        input_size = inference.classifier_input_size(variant)
+        inference.classify_face(ageNet, genderNet, largest_face(faceNet, warmup, profile), input_size)
+
+
+def worker_ready(_):
+    return worker_networks is not None
+
+
+def analyze_task(task):
+    path, profile, input_size = task
+    return analyze_sample(worker_networks, path, profile, input_size)
+
+
+def run_multiprocess(samples, workers, profile, variant, dnn_settings):
+    # The single-image work (largest face only, same profile) spread over worker processes
+    input_size = inference.classifier_input_size(variant)
+    timings = {stage: [] for stage in stages}
+    predictions = []
+    warmup_path = samples[0]["path"] if samples else None
+    with multiprocessing.Pool(workers, initializer=init_worker, initargs=(profile, variant, dnn_settings, warmup_path)) as pool:
+        # Time only the steady state, not each worker loading its networks
+        pool.map(worker_ready, range(workers))
+        start = time.perf_counter()
+        for _, prediction, timing in pool.imap(analyze_task, ((sample["path"], profile, input_size) for sample in samples),
+                                               chunksize=4):
+            add_timing(timings, timing)
+            predictions.append(prediction)
+        elapsed = time.perf_counter() - start
+    return predictions, timings, len(samples) / elapsed if elapsed else 0.0
+
+
+def compare(results, baseline):
+    # Print the headline numbers next to a previous results file
+    rows = [("age accuracy", ("age", "accuracy")), ("age within one", ("age", "within_one")),
+            ("gender accuracy", ("gender", "accuracy")), ("detection recall", ("detection", "recall"))]
+    rows += [(f"{mode} images/s", ("throughput", mode)) for mode in results["throughput"]]
+    rows += [(f"{mode} {stage} p95 ms", ("latency_ms", mode, stage, "p95")) for mode in results["latency_ms"] for stage in stages]
+    print(f"{'metric':>30} {'baseline':>10} {'current':>10}")
+    for name, keys in rows:
+        values = []
+        for source in (baseline, results):
+            for key in keys:
+                source = source.get(key) if isinstance(source, dict) else None
+            values.append(source)
+        print(f"{name:>30} " + " ".join(f"{value:>10.3f}" if isinstance(value, (int, float)) else f"{'-':>10}" for value in values))
+
+
+def evaluate(dataset="dataset", profile="accurate", variant="caffe-fp32", batch_size=16, workers=None, limit=None):
+    # Same backends and thread count as the app, so the numbers match what it will run
+    dnn_settings = select_dnn_settings()
+    faceNet, ageNet, genderNet = load_networks(dnn_settings, variant)
+    input_size = inference.classifier_input_size(variant)
+    samples = load_samples(dataset, limit)
+
+    # Warm-up so the first image does not carry network initialization
+    if samples:
+        warmup = cv2.imread(samples[0]["path"])
+        if warmup is not None:
+            inference.classify_face(ageNet, genderNet, largest_face(faceNet, warmup, profile), input_size)
+
+    networks = (faceNet, ageNet, genderNet)
+    results, single_predictions, single_timings, single_rate = run_single(*networks, samples, profile, input_size)
+    batched_predictions, batched_timings, batched_rate = run_batched(*networks, samples, profile, input_size, batch_size)
+    results["throughput"] = {"single": round(single_rate, 2), "batched": round(batched_rate, 2)}
+    timings = {"single": single_timings, "batched": batched_timings}
+    # Batching must not change any prediction
+    results["batched_mismatches"] = sum(a != b for a, b in zip(single_predictions, batched_predictions))
+
+    workers = workers if workers is not None else os.cpu_count() or 1
+    if workers > 1:
+        multiprocess_predictions, timings["multiprocess"], multiprocess_rate = run_multiprocess(samples, workers, profile,
+                                                                                              variant, dnn_settings)
+        results["throughput"]["multiprocess"] = round(multiprocess_rate, 2)
+        results["multiprocess_mismatches"] = sum(a != b for a, b in zip(single_predictions, multiprocess_predictions))
+    # Per mode, then per stage
+    results["latency_ms"] = {mode: {stage: percentiles(values) for stage, values in mode_timings.items()}
+                             for mode, mode_timings in timings.items()}
+
+    results["config"] = {"dataset": dataset, "profile": profile, "variant": variant, "batch_size": batch_size,
+                         "workers": workers, "limit": limit, "host": host_signature(), "dnn": dnn_settings,
+                         "recorded": time.strftime("%Y-%m-%d %H:%M:%S")}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Accuracy and throughput evaluation over the labeled dataset")
+    parser.add_argument("--dataset", default="dataset")
+    parser.add_argument("--profile", default="accurate", choices=list(inference.detector_profiles))
+    parser.add_argument("--variant", default="caffe-fp32")
+    parser.add_argument("--batch-size", type=int, default=16, help="Faces per classification batch in batched mode")
+    parser.add_argument("--workers", type=int, default=None, help="Processes for the multi-process run (1 skips it)")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--output", default="eval_results.json")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    # Read the baseline first so --output may overwrite the same file
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    results = evaluate(args.dataset, args.profile, args.variant, args.batch_size, args.workers, args.limit)
+    with open(args.output, "w") as output_file:
+        json.dump(results, output_file, indent=4, sort_keys=True)
+
+    print(f"Age accuracy {results['age']['accuracy']} (within one bucket {results['age']['within_one']}), "
+          f"gender accuracy {results['gender']['accuracy']}, detection recall {results['detection']['recall']}")
+    print(f"Images/s: {results['throughput']}")
+    print(f"Results -> {args.output}")
+    if baseline is not None:
+        compare(results, baseline)
+
+
+if __name__ == "__main__":
+    main()
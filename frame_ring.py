@@ -0,0 +1,252 @@
+import argparse
+import multiprocessing
+import queue
+import time
+from collections import deque
+from multiprocessing import shared_memory
+import numpy as np
+import cv2
+from inference import FrameAnalyzer
+from dnn_backend import load_networks, select_dnn_settings
+
+# Per-slot header: sequence number of the frame in the slot, its height and width
+header_fields = 3
+
+
+class FrameRing:
+    # Fixed-size frame slots in one shared memory block. Processes exchange (slot, sequence) pairs;
+    # the pixels are written once by the producer and read in place by the worker.
+    def __init__(self, slots=8, frame_shape=(480, 640, 3), name=None):
+        self.slots = slots
+        self.frame_shape = tuple(frame_shape)
+        header_size = slots * header_fields * 8
+        frames_size = slots * int(np.prod(self.frame_shape))
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=header_size + frames_size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.header = np.ndarray((slots, header_fields), dtype=np.int64, buffer=self.shm.buf)
+        self.frames = np.ndarray((slots,) + self.frame_shape, dtype=np.uint8, buffer=self.shm.buf, offset=header_size)
+        if self.owner:
+            self.header[:] = -1
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def spec(self):
+        # What a worker process needs to attach: FrameRing(*spec[1:], name=spec[0])
+        return self.name, self.slots, self.frame_shape
+
+    def write(self, slot, frame, sequence):
+        height, width = frame.shape[:2]
+        if height > self.frame_shape[0] or width > self.frame_shape[1]:
+            raise ValueError(f"Frame {width}x{height} does not fit a {self.frame_shape[1]}x{self.frame_shape[0]} slot")
+        self.frames[slot, :height, :width] = frame
+        self.header[slot] = (sequence, height, width)
+
+    def read(self, slot, sequence=None):
+        # View of the frame in the slot (no copy), or None when the slot holds a different sequence
+        stored, height, width = self.header[slot]
+        if sequence is not None and stored != sequence:
+            return None
+        return self.frames[slot, :height, :width]
+
+    def close(self):
+        # Drop the numpy views first; SharedMemory refuses to close while they exist
+        self.header = self.frames = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def ring_worker(worker_id, spec, work, results, profile, variant, dnn_settings):
+    # Worker process: analyzes frames in place in the ring and returns only the detections
+    name, slots, frame_shape = spec
+    ring = FrameRing(slots, frame_shape, name=name)
+    try:
+        faceNet, ageNet, genderNet = load_networks(dnn_settings, variant)
+        analyzer = FrameAnalyzer(faceNet, ageNet, genderNet, profile=profile, variant=variant)
+    except Exception as exc:
+        # Tell the parent instead of leaving it waiting for "ready"
+        results.put(("error", worker_id, repr(exc)))
+        ring.close()
+        return
+    results.put(("ready", worker_id, None))
+    try:
+        while True:
+            item = work.get()
+            if item is None:
+                return
+            slot, sequence = item
+            frame = ring.read(slot, sequence)
+            if frame is None:
+                results.put((slot, sequence, None, None))
+                continue
+            # Labels are drawn into the slot, so the producer can display the annotated frame
+            try:
+                _, faces = analyzer.analyze(frame)
+            except Exception as exc:
+                # The slot still goes back to the producer; one bad frame must not stop the worker
+                results.put((slot, sequence, None, repr(exc)))
+                continue
+            results.put((slot, sequence, faces, None))
+    finally:
+        ring.close()
+
+
+class ProcessInference:
+    # Inference in worker processes fed through a FrameRing. A slot belongs to the producer while
+    # free, to a worker once submitted, and comes back when its result has been collected.
+    def __init__(self, workers=2, slots=8, frame_shape=(480, 640, 3), profile="default", variant="caffe-fp32",
+                 ready_timeout=120.0):
+        self.ring = FrameRing(max(slots, workers + 1), frame_shape)
+        self.free_slots = deque(range(self.ring.slots))
+        self.work = multiprocessing.Queue()
+        self.results = multiprocessing.Queue()
+        self.sequence = 0
+        self.counters = {"submitted": 0, "completed": 0, "dropped": 0, "mismatched": 0, "failed": 0}
+        dnn_settings = select_dnn_settings()
+        worker_args = (self.ring.spec(), self.work, self.results, profile, variant, dnn_settings)
+        self.processes = [multiprocessing.Process(target=ring_worker, args=(index,) + worker_args, name=f"ring-worker-{index}",
+                                                  daemon=True)
+                          for index in range(workers)]
+        for process in self.processes:
+            process.start()
+        try:
+            self.wait_ready(ready_timeout)
+        except RuntimeError:
+            self.abort()
+            raise
+
+    def wait_ready(self, timeout):
+        # Wait for every worker to load its networks before frames start counting; a worker that
+        # reports an error, dies or is still loading after timeout seconds fails the whole pool
+        ready = set()
+        deadline = time.monotonic() + timeout
+        while len(ready) < len(self.processes):
+            try:
+                status, worker_id, error = self.results.get(timeout=1.0)
+            except queue.Empty:
+                dead = [process.name for process in self.processes if not process.is_alive()]
+                if dead:
+                    raise RuntimeError(f"Ring worker exited while loading its networks: {', '.join(dead)}")
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"Ring workers not ready after {timeout:.0f}s ({len(ready)}/{len(self.processes)})")
+                continue
+            if status == "error":
+                raise RuntimeError(f"ring-worker-{worker_id} failed to load its networks: {error}")
+            ready.add(worker_id)
+
+    def abort(self):
+        # Startup failed: stop whatever workers are still running and release the shared memory
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+        for process in self.processes:
+            process.join(timeout=5)
+        self.ring.close()
+
+    def submit(self, frame):
+        # Never blocks: with every slot in use the frame is dropped and False returned
+        if not self.free_slots:
+            self.counters["dropped"] += 1
+            return False
+        slot = self.free_slots.popleft()
+        self.sequence += 1
+        self.ring.write(slot, frame, self.sequence)
+        self.work.put((slot, self.sequence))
+        self.counters["submitted"] += 1
+        return True
+
+    def in_flight(self):
+        return self.ring.slots - len(self.free_slots)
+
+    def poll(self, timeout=0):
+        # Collected results as (sequence, annotated frame, faces). With several workers they can
+        # finish out of order; a display should skip sequences older than the last one it showed.
+        completed = []
+        while True:
+            try:
+                slot, sequence, faces, error = self.results.get(timeout=timeout)
+            except queue.Empty:
+                if not completed:
+                    self.check_workers()
+                return completed
+            timeout = 0
+            if faces is not None:
+                # Copy out of the slot before handing it back to the producer
+                completed.append((sequence, self.ring.read(slot).copy(), faces))
+                self.counters["completed"] += 1
+            elif error is not None:
+                self.counters["failed"] += 1
+                print(f"Frame {sequence} failed: {error}")
+            else:
+                self.counters["mismatched"] += 1
+            self.free_slots.append(slot)
+
+    def check_workers(self):
+        # A worker that died took its slots with it; fail rather than wait for them forever
+        dead = [f"{process.name} (exit code {process.exitcode})" for process in self.processes if not process.is_alive()]
+        if dead:
+            raise RuntimeError(f"Ring worker exited: {', '.join(dead)}")
+
+    def stats(self):
+        stats = dict(self.counters)
+        stats["in_flight"] = self.in_flight()
+        return stats
+
+    def close(self):
+        for _ in self.processes:
+            self.work.put(None)
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self.ring.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless age/gender inference with worker processes fed by a shared-memory frame ring")
+    parser.add_argument("source", help="Camera index or video file")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--slots", type=int, default=8)
+    parser.add_argument("--profile", default="default")
+    parser.add_argument("--stats-every", type=float, default=5.0)
+    args = parser.parse_args()
+
+    video = cv2.VideoCapture(int(args.source) if args.source.isdigit() else args.source)
+    ret, frame = video.read()
+    if not ret:
+        raise SystemExit(f"Cannot read from {args.source}")
+    live = args.source.isdigit()
+    pool = ProcessInference(args.workers, args.slots, frame.shape, args.profile)
+    start = last_report = time.perf_counter()
+    try:
+        while ret:
+            # Files wait for a free slot so no frame is lost; cameras drop frames when behind
+            while not live and not pool.free_slots:
+                pool.poll(timeout=0.1)
+            pool.submit(frame)
+            pool.poll()
+            if time.perf_counter() - last_report >= args.stats_every:
+                last_report = time.perf_counter()
+                stats = pool.stats()
+                print(f"{stats['completed'] / (last_report - start):.1f} fps, {stats}")
+            ret, frame = video.read()
+        while pool.in_flight():
+            pool.poll(timeout=0.1)
+    except KeyboardInterrupt:
+        pass
+    except RuntimeError as error:
+        raise SystemExit(f"Stopped: {error}")
+    finally:
+        video.release()
+        pool.close()
+    elapsed = time.perf_counter() - start
+    print(f"Done: {pool.counters['completed']} frames in {elapsed:.1f}s ({pool.counters['completed'] / elapsed:.1f} fps)")
+
+
+if __name__ == "__main__":
+    main()
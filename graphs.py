@@ -1,15 +1,20 @@
 import tkinter as tk
 from tkinter import ttk
-import json
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from capture_aggregates import get_capture_aggregates, last_days, parse_hours
+
+# Relative ranges offered above the individual dates
+range_presets = {"Last 7 days": 7, "Last 30 days": 30, "Last 90 days": 90}
+hour_presets = ["All day", "06-10", "10-14", "14-18", "18-22"]
 
 class GraphsTab(tk.Frame):
     def __init__(self, master, *args, **kwargs):
         super().__init__(master, *args, **kwargs)
 
-        # Specify the path to your log.json file
-        self.json_file = "log.json"
+        # Counts come from the incrementally maintained aggregates, not from the raw log
+        self.aggregates = get_capture_aggregates()
+        self.aggregates.refresh()
         self.ageList = ['11-15', '16-20', '21-25', '26-30', '31-35', '36-40', '41-45', '46-50', '51-55']
         self.genderList = ["Male", "Female"]
 
@@ -21,6 +26,10 @@ class GraphsTab(tk.Frame):
         self.selected_date = tk.StringVar()
         self.selected_date.set("All")  # Default selected date
 
+        # Time-of-day filter such as "10-14"; answered from the hourly rollups
+        self.selected_hours = tk.StringVar()
+        self.selected_hours.set("All day")
+
         # Display graphs automatically
         self.create_widgets()
 
@@ -30,18 +39,11 @@ class GraphsTab(tk.Frame):
         self.display_graphs()
 
     def set_initial_selected_date(self):
-        try:
-            with open(self.json_file) as jsonfile:
-                data = json.load(jsonfile)
-                available_dates = [entry.get("Date", "") for entry in data if entry.get("Date")]
-                unique_dates = sorted(set(available_dates))
-
-                # Set the selected date to "All" if no unique dates are available
-                if not unique_dates:
-                    self.selected_date.set("All")
+        unique_dates = self.aggregates.dates()
 
-        except (json.JSONDecodeError, FileNotFoundError):
-            pass  # Handle file not found or invalid JSON
+        # Set the selected date to "All" if no unique dates are available
+        if not unique_dates:
+            self.selected_date.set("All")
 
     def create_widgets(self):
         # Create a label and text label for mimicking the select field
@@ -58,11 +60,19 @@ class GraphsTab(tk.Frame):
         label.bind("<Button-1>", lambda event: self.show_menu(event, label, label_text))
 
         # Create a date picker using ttkcalendar
-        date_picker = ttk.Combobox(self, values=["All"] + self.get_unique_dates(), font=("Arial", 12), width=15)
+        filter_frame = tk.Frame(self, bg="white")
+        filter_frame.pack(side=tk.TOP, anchor=tk.NW, padx=(10, 0), pady=(0, 20))
+        date_picker = ttk.Combobox(filter_frame, values=["All"] + list(range_presets) + self.get_unique_dates(), font=("Arial", 12), width=15)
         date_picker.set("All")  # Default value
-        date_picker.pack(side=tk.TOP, anchor=tk.NW, padx=(10, 0), pady=(0, 20))  # Updated configuration
+        date_picker.pack(side=tk.LEFT)
         date_picker.bind("<<ComboboxSelected>>", self.update_date)
 
+        # Hours can also be typed, e.g. "9-17"
+        hours_picker = ttk.Combobox(filter_frame, textvariable=self.selected_hours, values=hour_presets, font=("Arial", 12), width=10)
+        hours_picker.pack(side=tk.LEFT, padx=(10, 0))
+        hours_picker.bind("<<ComboboxSelected>>", self.display_graphs)
+        hours_picker.bind("<Return>", self.display_graphs)
+
     def show_menu(self, event, label, label_text):
         # Create a menu
         graph_type_options = ["Pie Chart", "Bar Graph"]
@@ -84,47 +94,36 @@ class GraphsTab(tk.Frame):
         self.display_graphs()
 
     def get_unique_dates(self):
-        try:
-            with open(self.json_file) as jsonfile:
-                data = json.load(jsonfile)
-                dates = set(entry.get("Date", "") for entry in data)
-                return sorted(list(dates))
-        except (json.JSONDecodeError, FileNotFoundError):
-            return []
+        return self.aggregates.dates()
+
+    def selected_range(self):
+        # (start, end, hours) for the rollup query
+        selected = self.selected_date.get()
+        if selected == "All":
+            start = end = None
+        elif selected in range_presets:
+            start, end = last_days(range_presets[selected])
+        else:
+            start = end = selected
 
-    def display_graphs(self, *args):
         try:
-            with open(self.json_file) as jsonfile:
-                data = json.load(jsonfile)
-
-                # Filter data based on the selected date
-                if self.selected_date.get() != "All":
-                    data = [entry for entry in data if entry.get("Date") == self.selected_date.get()]
-
-                # Check if the data is a list of entries
-                if not isinstance(data, list):
-                    # Clear previous widgets
-                    self.clear_graphs_tab()
+            hours = None if self.selected_hours.get() == "All day" else parse_hours(self.selected_hours.get())
+        except ValueError:
+            hours = None
+        return start, end, hours
 
-                    tk.Label(self, text="No data available for graphs", relief='ridge', width=20).pack(side=tk.LEFT)
-                    return
-
-                # Extract age and gender data from the JSON file entries
-                age_data = [entry.get("Age", "") for entry in data]
-                gender_data = [entry.get("Gender", "") for entry in data]
-
-                # Display the graph based on the selected graph type
-                if self.selected_graph_type.get() == "Pie Chart":
-                    self.display_pie_chart(age_data, gender_data)
-                elif self.selected_graph_type.get() == "Bar Graph":
-                    self.display_bar_graph(age_data, gender_data)
+    def display_graphs(self, *args):
+        # Fold in captures logged since the last redraw, then read the counts for the selected range
+        self.aggregates.refresh()
+        age_counts, gender_counts = self.aggregates.query(*self.selected_range())
 
-        except (json.JSONDecodeError, FileNotFoundError):
-            # Clear previous widgets
-            self.clear_graphs_tab()
-            print("")
+        # Display the graph based on the selected graph type
+        if self.selected_graph_type.get() == "Pie Chart":
+            self.display_pie_chart(age_counts, gender_counts)
+        elif self.selected_graph_type.get() == "Bar Graph":
+            self.display_bar_graph(age_counts, gender_counts)
 
-    def display_pie_chart(self, age_data, gender_data):
+    def display_pie_chart(self, age_totals, gender_totals):
         # Create the figure for both pie charts
         if not hasattr(self, 'figure'):
             self.figure, (self.age_ax, self.gender_ax) = plt.subplots(1, 2, figsize=(12, 6))
@@ -132,9 +131,9 @@ class GraphsTab(tk.Frame):
             self.canvas_widget = self.canvas.get_tk_widget()
             self.canvas_widget.pack(fill=tk.BOTH, expand=True)
 
-        # Count the occurrences of each age range and gender
-        age_counts = {age_range: age_data.count(age_range) for age_range in self.ageList}
-        gender_counts = {gender: gender_data.count(gender) for gender in self.genderList}
+        # Pick out the counts for each age range and gender
+        age_counts = {age_range: age_totals[age_range] for age_range in self.ageList}
+        gender_counts = {gender: gender_totals[gender] for gender in self.genderList}
 
         # Create a color map for age ranges
         age_colors = {
@@ -169,7 +168,7 @@ class GraphsTab(tk.Frame):
             if isinstance(widget, tk.Label) and widget.cget("text") == "No data available for graphs":
                 widget.destroy()
 
-    def display_bar_graph(self, age_data, gender_data):
+    def display_bar_graph(self, age_totals, gender_totals):
         # Create the figure for both bar charts
         if not hasattr(self, 'figure'):
             self.figure, (self.age_ax, self.gender_ax) = plt.subplots(1, 2, figsize=(12, 6))
@@ -177,9 +176,9 @@ class GraphsTab(tk.Frame):
             self.canvas_widget = self.canvas.get_tk_widget()
             self.canvas_widget.pack(fill=tk.BOTH, expand=True)
 
-        # Count the occurrences of each age range and gender
-        age_counts = {age_range: age_data.count(age_range) for age_range in self.ageList}
-        gender_counts = {gender: gender_data.count(gender) for gender in self.genderList}
+        # Pick out the counts for each age range and gender
+        age_counts = {age_range: age_totals[age_range] for age_range in self.ageList}
+        gender_counts = {gender: gender_totals[gender] for gender in self.genderList}
 
         # Create a color map for age ranges
         age_colors = {
@@ -0,0 +1,229 @@
+import os
+import json
+import cv2
+import numpy as np
+from profiling import get_profiler
+
+faceProto = "opencv_face_detector.pbtxt"
+faceModel = "opencv_face_detector_uint8.pb"
+
+ageProto = "age_deploy.prototxt"
+ageModel = "age_net.caffemodel"
+
+genderProto = "gender_deploy.prototxt"
+genderModel = "gender_net.caffemodel"
+
+MODEL_MEAN_VALUES = (78.4263377603, 87.7689143744, 114.895847746)
+ageList = ['11-15', '16-20', '21-25', '26-30', '31-35', '36-40', '41-45', '46-50', '51-55']
+genderList = ['Male', 'Female']
+
+padding = 20
+line_margin = 5
+
+
+network_files = {
+    "face": (faceModel, faceProto),
+    "age": (ageModel, ageProto),
+    "gender": (genderModel, genderProto),
+}
+
+# Age/gender classifier variants: model and config files (config "" for ONNX) and the input size they expect.
+# More variants, e.g. INT8-quantized ONNX exports, can be added in classifier_variants.json.
+classifier_variants = {
+    "caffe-fp32": {"age": [ageModel, ageProto], "gender": [genderModel, genderProto], "size": [227, 227]},
+}
+classifier_variants_path = "classifier_variants.json"
+
+
+def load_classifier_variants(path=classifier_variants_path):
+    variants = dict(classifier_variants)
+    if os.path.exists(path):
+        with open(path) as variants_file:
+            added = json.load(variants_file)
+        for name, variant in added.items():
+            # Each needs [model, config] for age and gender and a [width, height] input size
+            if not isinstance(variant, dict) or not all(isinstance(variant.get(key), list) and len(variant[key]) == 2
+                                                        for key in ("age", "gender", "size")):
+                raise ValueError(f"Classifier variant {name} in {path} needs age and gender [model, config] "
+                                 f"and size [width, height]")
+        variants.update(added)
+    return variants
+
+
+def get_classifier_variant(variant="caffe-fp32"):
+    variants = load_classifier_variants()
+    if variant not in variants:
+        raise ValueError(f"Unknown classifier variant {variant}; known: {', '.join(variants)}")
+    return variants[variant]
+
+
+def read_network(network, variant="caffe-fp32"):
+    if network == "face":
+        model, proto = network_files[network]
+    else:
+        model, proto = get_classifier_variant(variant)[network]
+    return cv2.dnn.readNet(model, proto)
+
+
+def classifier_input_size(variant="caffe-fp32"):
+    return tuple(get_classifier_variant(variant)["size"])
+
+
+def load_networks(variant="caffe-fp32"):
+    faceNet = read_network("face")
+    ageNet = read_network("age", variant)
+    genderNet = read_network("gender", variant)
+    return faceNet, ageNet, genderNet
+
+
+# Detector speed/accuracy profiles: input size (None = the frame's own size), confidence and NMS IoU (None = off)
+detector_profiles = {
+    "fast": {"size": (160, 160), "confidence": 0.6, "nms": 0.4},
+    "default": {"size": (227, 227), "confidence": 0.7, "nms": None},
+    "accurate": {"size": (300, 300), "confidence": 0.7, "nms": 0.4},
+    "full": {"size": None, "confidence": 0.7, "nms": 0.4},
+}
+
+
+def decode_detections(detection, frame_shape, confidence_threshold=0.7, nms_threshold=None):
+    # Vectorized SSD decode: confidence mask, scale to pixels, clip to the frame, optional NMS
+    frameHeight, frameWidth = frame_shape[:2]
+    candidates = detection[0, 0]
+    candidates = candidates[candidates[:, 2] > confidence_threshold]
+    confidences = candidates[:, 2].astype(float)
+
+    boxes = (candidates[:, 3:7] * [frameWidth, frameHeight, frameWidth, frameHeight]).astype(int)
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, frameWidth - 1)
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, frameHeight - 1)
+
+    # Boxes that lie entirely outside the frame collapse to nothing after clipping
+    valid = (boxes[:, 2] > boxes[:, 0]) & (boxes[:, 3] > boxes[:, 1])
+    boxes, confidences = boxes[valid], confidences[valid]
+
+    if nms_threshold is not None and len(boxes):
+        keep = cv2.dnn.NMSBoxes(np.column_stack((boxes[:, :2], boxes[:, 2:] - boxes[:, :2])).tolist(),
+                                confidences.tolist(), confidence_threshold, nms_threshold)
+        keep = np.sort(np.asarray(keep, dtype=int).reshape(-1))
+        boxes, confidences = boxes[keep], confidences[keep]
+    return boxes, confidences
+
+
+def crop_windows(boxes, frame_shape):
+    # Padded crop window (y1, y2, x1, x2) for every box at once
+    frameHeight, frameWidth = frame_shape[:2]
+    boxes = np.asarray(boxes, dtype=int).reshape(-1, 4)
+    windows = np.empty_like(boxes)
+    windows[:, 0] = np.maximum(0, boxes[:, 1] - padding)
+    windows[:, 1] = np.minimum(boxes[:, 3] + padding, frameHeight - 1)
+    windows[:, 2] = np.maximum(0, boxes[:, 0] - padding)
+    windows[:, 3] = np.minimum(boxes[:, 2] + padding, frameWidth - 1)
+    return windows
+
+
+def run_detector(face_net, frame, profile="default"):
+    settings = detector_profiles[profile]
+    size = settings["size"] or (frame.shape[1], frame.shape[0])
+    blob = cv2.dnn.blobFromImage(frame, 1.0, size, [104, 117, 123], swapRB=False)
+    face_net.setInput(blob)
+    return face_net.forward()
+
+
+def detect_faces(face_net, frame, profile="default"):
+    # Run the SSD detector and return boxes and confidences without touching the frame
+    settings = detector_profiles[profile]
+    detection = run_detector(face_net, frame, profile)
+    boxes, confidences = decode_detections(detection, frame.shape, settings["confidence"], settings["nms"])
+    return boxes.tolist(), confidences.tolist()
+
+
+def draw_boxes(frame, bboxs):
+    for x1, y1, x2, y2 in bboxs:
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 2)  # Set box color to red (BGR: 0, 0, 255)
+
+
+def face_box(face_net, frame, profile="default"):
+    bboxs, _ = detect_faces(face_net, frame, profile)
+    draw_boxes(frame, bboxs)
+    return frame, bboxs
+
+
+def face_region(frame, bbox):
+    # Padded face window, clipped to the frame
+    return (slice(max(0, bbox[1] - padding), min(bbox[3] + padding, frame.shape[0] - 1)),
+            slice(max(0, bbox[0] - padding), min(bbox[2] + padding, frame.shape[1] - 1)))
+
+
+def classify_face(ageNet, genderNet, face, input_size=(227, 227)):
+    blob = cv2.dnn.blobFromImage(face, 1.0, input_size, MODEL_MEAN_VALUES, swapRB=False)
+    genderNet.setInput(blob)
+    genderPred = genderNet.forward()
+    gender = genderList[genderPred[0].argmax()]
+
+    ageNet.setInput(blob)
+    agePred = ageNet.forward()
+    age = ageList[agePred[0].argmax()]
+    return age, gender
+
+
+def classify_faces(ageNet, genderNet, faces, input_size=(227, 227)):
+    # Stack every face crop into one batch so each network runs once per frame
+    if not faces:
+        return []
+    blob = cv2.dnn.blobFromImages(faces, 1.0, input_size, MODEL_MEAN_VALUES, swapRB=False)
+    genderNet.setInput(blob)
+    genderPreds = genderNet.forward()
+
+    ageNet.setInput(blob)
+    agePreds = ageNet.forward()
+    return [(ageList[agePred.argmax()], genderList[genderPred.argmax()])
+            for agePred, genderPred in zip(agePreds, genderPreds)]
+
+
+def draw_labels(frame, bbox, age, gender):
+    label_gender = "Gender: {}".format(gender)
+    label_age = "Age: {}".format(age)
+
+    text_size_gender = cv2.getTextSize(label_gender, cv2.FONT_HERSHEY_DUPLEX, 0.6, 1)[0]
+    text_size_age = cv2.getTextSize(label_age, cv2.FONT_HERSHEY_DUPLEX, 0.6, 1)[0]
+
+    cv2.putText(frame, label_gender, (bbox[0], bbox[3] + text_size_gender[1] + line_margin),
+                cv2.FONT_HERSHEY_DUPLEX, 0.6, (255, 255, 255), 1, cv2.LINE_AA)
+    cv2.putText(frame, label_age, (bbox[0], bbox[3] + text_size_gender[1] + text_size_age[1] + 2 * line_margin),
+                cv2.FONT_HERSHEY_DUPLEX, 0.6, (255, 255, 255), 1, cv2.LINE_AA)
+
+
+class FrameAnalyzer:
+    def __init__(self, faceNet=None, ageNet=None, genderNet=None, batched=True, profile="default", variant="caffe-fp32"):
+        if faceNet is None:
+            faceNet, ageNet, genderNet = load_networks(variant)
+        self.faceNet = faceNet
+        self.ageNet = ageNet
+        self.genderNet = genderNet
+        self.batched = batched
+        self.profile = profile  # Detector profile; may be switched while running
+        self.input_size = classifier_input_size(variant)
+        self.profiler = get_profiler()
+
+    def detect(self, frame):
+        with self.profiler.stage("detect"):
+            return face_box(self.faceNet, frame, self.profile)
+
+    def classify(self, crops):
+        if not crops:
+            return []
+        with self.profiler.stage("classify"):
+            if self.batched:
+                return classify_faces(self.ageNet, self.genderNet, crops, self.input_size)
+            return [classify_face(self.ageNet, self.genderNet, face, self.input_size) for face in crops]
+
+    def analyze(self, frame):
+        # Detect faces, classify them and draw the labels onto the frame
+        frame, bboxs = self.detect(frame)
+
+        # Crop every face before any label is drawn so both paths see the same pixels
+        crops = [frame[y1:y2, x1:x2] for y1, y2, x1, x2 in crop_windows(bboxs, frame.shape)]
+        faces = []
+        for bbox, (age, gender) in zip(bboxs, self.classify(crops)):
+            draw_labels(frame, bbox, age, gender)
+            faces.append({"bbox": bbox, "age": age, "gender": gender})
+        return frame, faces
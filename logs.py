@@ -1,11 +1,10 @@
 import tkinter as tk
 from tkinter import ttk
-import json
-from json.decoder import JSONDecodeError
 from datetime import datetime
 from PIL import Image, ImageTk
 from tkinter import messagebox
-import os  # Import the os module for path operations
+from capture_store import get_capture_store
+from capture_log import get_capture_log, LogView
 
 class LogsTab(tk.Frame):
     def __init__(self, master, *args, **kwargs):
@@ -22,28 +21,75 @@ class LogsTab(tk.Frame):
         # Set alternate background colors for rows
         self.tree.tag_configure("oddrow", background="#f0f0f0")
 
-        self.tree.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
+        # The table only holds the rows on screen; this scrollbar moves through the whole log
+        self.scrollbar = tk.Scrollbar(self, orient=tk.VERTICAL, command=self.on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y, pady=20, padx=(0, 20))
+        self.tree.pack(fill=tk.BOTH, expand=True, padx=(20, 0), pady=20)
 
-        # Load data from the log.json file
-        try:
-            with open("log.json", "r") as file:
-                log_data = json.load(file)
-            self.populate_table(log_data)
-        except FileNotFoundError:
-            tk.Label(self, text="Log file not found.", font=("Arial", 12), fg="red").pack(pady=10)
-        except JSONDecodeError:
-            print("")
+        # Rows are paged in from the capture log as the view scrolls
+        self.log_view = LogView(get_capture_log())
+        self.first_row = 0
+        self.page_size = 60
 
-        # Set the double-click event handler for the treeview
-        self.tree.bind("<Double-1>", self.show_image_popup)
-
-    def populate_table(self, log_data):
-        # Insert data into the table with centered text alignment for all columns
         for col in self.tree["columns"]:
             self.tree.heading(col, anchor="center")
             self.tree.column(col, anchor="center")
 
-        for i, log_entry in enumerate(log_data):
+        self.tree.bind("<MouseWheel>", self.on_mousewheel)
+        self.tree.bind("<Button-4>", lambda event: self.scroll_rows(-3))
+        self.tree.bind("<Button-5>", lambda event: self.scroll_rows(3))
+        self.tree.bind("<Configure>", lambda event: self.scroll_rows(0))
+
+        # Set the double-click event handler for the treeview
+        self.tree.bind("<Double-1>", self.show_image_popup)
+
+        # Watch the log for new captures while the tab is open
+        self.bind("<Destroy>", self.on_destroy)
+        self.populate_table()
+        self.poll_log()
+
+    def visible_rows(self):
+        row_height = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+        return max(1, self.tree.winfo_height() // row_height - 1)
+
+    def scroll_rows(self, delta):
+        max_first = max(0, self.log_view.count() - self.visible_rows())
+        self.first_row = min(max(0, self.first_row + delta), max_first)
+        self.populate_table()
+
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.first_row = int(float(amount) * self.log_view.count())
+            self.scroll_rows(0)
+        elif unit == "pages":
+            self.scroll_rows(int(amount) * self.visible_rows())
+        else:
+            self.scroll_rows(int(amount))
+
+    def on_mousewheel(self, event):
+        self.scroll_rows(-3 * int(event.delta / 120))
+        return "break"
+
+    def poll_log(self):
+        previous_count = self.log_view.count()
+        if self.log_view.refresh() != previous_count:
+            self.populate_table()
+        self.poll_id = self.after(2000, self.poll_log)
+
+    def on_destroy(self, event):
+        if event.widget is self and hasattr(self, "poll_id"):
+            self.after_cancel(self.poll_id)
+
+    def populate_table(self):
+        # Replace the table contents with the page of rows starting at first_row
+        self.tree.delete(*self.tree.get_children(""))
+
+        total = self.log_view.count()
+        log_data = self.log_view.page(self.first_row, self.first_row + self.page_size)
+
+        for i, log_entry in enumerate(log_data, start=self.first_row):
+            if log_entry is None:
+                continue
             date_str = log_entry.get("Date", "")
             time_str = log_entry.get("Time", "")
 
@@ -64,11 +110,16 @@ class LogsTab(tk.Frame):
             tags = ("oddrow",) if i % 2 == 1 else ()
             self.tree.insert("", "end", values=values, tags=tags)
 
+        if total:
+            self.scrollbar.set(self.first_row / total, min(1.0, (self.first_row + self.visible_rows()) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
     def sort_column(self, col, reverse):
-        data = [(self.tree.set(child, col), child) for child in self.tree.get_children("")]
-        data.sort(reverse=reverse)
-        for i, item in enumerate(data):
-            self.tree.move(item[1], "", i)
+        # Sort the underlying log records and jump back to the first row
+        self.log_view.sort(col, reverse)
+        self.first_row = 0
+        self.populate_table()
         self.tree.heading(col, command=lambda: self.sort_column(col, not reverse), anchor="center")
 
     def show_image_popup(self, event):
@@ -81,8 +132,8 @@ class LogsTab(tk.Frame):
             item_values = self.tree.item(selected_item, "values")
             image_filename = item_values[-1]  # Get the image filename from the last column
 
-            # Construct the image path based on your file structure
-            image_path = os.path.join("captured_images", image_filename)
+            # The store knows which date/camera partition holds the image
+            image_path = get_capture_store().resolve(image_filename)
 
             # Open and display the image in a pop-up window
             try:
@@ -123,8 +174,9 @@ class LogsTab(tk.Frame):
                 image_popup.resizable(False, False)
                 image_popup.attributes("-toolwindow", 1)
 
-            except FileNotFoundError:
-                tk.messagebox.showerror("Error", f"Image not found: {image_path}")
+            except OSError:
+                # Log records outlive their images once retention archives or prunes a day
+                messagebox.showerror("Error", f"Image not available (archived or deleted?): {image_path}")
 
 if __name__ == "__main__":
     root = tk.Tk()
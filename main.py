@@ -4,6 +4,8 @@ from logs import LogsTab
 from graphs import GraphsTab
 from captured_images import CapturedImagesTab
 from realtime_video import RealtimeVideoTab
+from engine import shutdown_engine
+from capture_log import close_capture_log
 
 class GUIApp:
     def __init__(self, master):
@@ -26,6 +28,9 @@ class GUIApp:
 
         self.master.geometry(f"{window_width}x{window_height}+{x_position}+{y_position}")
 
+        # Release the camera and stop the inference threads when the window closes
+        self.master.protocol("WM_DELETE_WINDOW", self.on_close)
+
         # Create a frame for the sidebar with a black background
         self.sidebar_frame = tk.Frame(self.master, width=sidebar_width, bg="black")
         self.sidebar_frame.pack(side=tk.LEFT, fill=tk.Y)
@@ -66,6 +71,11 @@ class GUIApp:
         # Set colors for the selected label
         selected_label.configure(bg="white", fg="black")
 
+    def on_close(self):
+        shutdown_engine()
+        close_capture_log()
+        self.master.destroy()
+
     def show_logs(self):
         self.content_frame.destroy()
         self.content_frame = LogsTab(self.master, bg="white")
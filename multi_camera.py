@@ -0,0 +1,196 @@
+import argparse
+import threading
+import time
+from collections import deque
+import cv2
+from inference import FrameAnalyzer
+from dnn_backend import load_networks, select_dnn_settings
+from capture import CaptureRecorder
+from video_pipeline import DropOldestQueue, StageStats
+
+
+class CameraStream:
+    # One camera or file source: its own capture thread, bounded frame queue and stats
+    def __init__(self, name, source, queue_size=2, max_in_flight=1, recorder=None):
+        self.name = name
+        self.source = source
+        self.frame_queue = DropOldestQueue(queue_size)
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.recorder = recorder
+
+        self.capture_stats = StageStats()
+        self.inference_stats = StageStats()
+        self.latencies = deque(maxlen=100)
+        self.errors = 0  # Frames whose analysis or recording raised
+        self.finished = False
+        # Live sources drop their oldest frame when behind; files wait so no frame is lost
+        self.live = isinstance(source, int) or str(source).startswith(("rtsp://", "http://", "https://"))
+        self.video = None
+        self.thread = None
+
+    def start(self, running, work_available):
+        self.video = cv2.VideoCapture(self.source)
+        self.thread = threading.Thread(target=self.capture_loop, args=(running, work_available),
+                                       name=f"capture-{self.name}", daemon=True)
+        self.thread.start()
+
+    def capture_loop(self, running, work_available):
+        while running.is_set():
+            ret, frame = self.video.read()
+            if not ret:
+                # Files end; live cameras get retried
+                if not self.live:
+                    break
+                time.sleep(0.01)
+                continue
+            while not self.live and self.frame_queue.qsize() >= self.frame_queue.maxsize and running.is_set():
+                time.sleep(0.005)
+            self.frame_queue.put((time.monotonic(), frame))
+            self.capture_stats.tick()
+            with work_available:
+                work_available.notify()
+        self.finished = True
+        self.video.release()
+        with work_available:
+            work_available.notify_all()
+
+    def record_result(self, captured_at):
+        self.inference_stats.tick()
+        self.latencies.append((time.monotonic() - captured_at) * 1000)
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+        return {
+            "capture_fps": self.capture_stats.fps(),
+            "inference_fps": self.inference_stats.fps(),
+            "latency_ms": sum(latencies) / len(latencies) if latencies else 0.0,
+            "latency_p95_ms": latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+            "queue": self.frame_queue.qsize(),
+            "dropped": self.frame_queue.dropped,
+            "in_flight": self.in_flight,
+            "errors": self.errors,
+        }
+
+
+class MultiCameraPipeline:
+    # N camera streams feeding a shared pool of inference threads, each with its own networks
+    def __init__(self, sources, workers=2, queue_size=2, max_in_flight=1, record=True, on_result=None):
+        self.streams = []
+        for index, source in enumerate(sources):
+            name, source = source if isinstance(source, tuple) else (f"cam{index}", source)
+            recorder = CaptureRecorder(camera=name) if record else None
+            self.streams.append(CameraStream(name, source, queue_size, max_in_flight, recorder))
+
+        self.workers = workers
+        self.on_result = on_result
+        self.running = threading.Event()
+        self.work_available = threading.Condition()
+        self.cursor = 0
+        self.threads = []
+
+    def start(self):
+        self.running.set()
+        for stream in self.streams:
+            stream.start(self.running, self.work_available)
+        dnn_settings = select_dnn_settings()
+        for index in range(self.workers):
+            analyzer = FrameAnalyzer(*load_networks(dnn_settings))
+            thread = threading.Thread(target=self.worker_loop, args=(analyzer,), name=f"inference-{index}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        self.running.clear()
+        with self.work_available:
+            self.work_available.notify_all()
+        for thread in self.threads + [stream.thread for stream in self.streams]:
+            if thread is not None:
+                thread.join(timeout=2)
+        self.threads = []
+        for stream in self.streams:
+            if stream.recorder is not None:
+                stream.recorder.close()
+
+    def next_frame(self):
+        # Round-robin over streams so a fast camera cannot starve the others
+        with self.work_available:
+            while self.running.is_set():
+                for offset in range(len(self.streams)):
+                    stream = self.streams[(self.cursor + offset) % len(self.streams)]
+                    if stream.in_flight >= stream.max_in_flight:
+                        continue
+                    item = stream.frame_queue.get(timeout=0)
+                    if item is not None:
+                        stream.in_flight += 1
+                        self.cursor = (self.cursor + offset + 1) % len(self.streams)
+                        return stream, item
+                if all(stream.finished and not stream.frame_queue.qsize() for stream in self.streams):
+                    return None, None
+                self.work_available.wait(0.1)
+        return None, None
+
+    def worker_loop(self, analyzer):
+        while self.running.is_set():
+            stream, item = self.next_frame()
+            if stream is None:
+                return
+            captured_at, frame = item
+            try:
+                frame, faces = analyzer.analyze(frame)
+                stream.record_result(captured_at)
+                if stream.recorder is not None:
+                    stream.recorder.maybe_capture(frame, faces)
+                if self.on_result is not None:
+                    self.on_result(stream.name, frame, faces)
+            except Exception as error:
+                # One bad frame must not take an inference thread out of the shared pool
+                with self.work_available:
+                    stream.errors += 1
+                print(f"Inference failed on {stream.name}: {error!r}")
+            finally:
+                with self.work_available:
+                    stream.in_flight -= 1
+                    self.work_available.notify()
+
+    def is_finished(self):
+        return all(stream.finished and not stream.frame_queue.qsize() and not stream.in_flight for stream in self.streams)
+
+    def stats(self):
+        return {stream.name: stream.stats() for stream in self.streams}
+
+
+def parse_source(value):
+    # "0" is a camera index, "name=source" names the stream
+    name = None
+    if "=" in value and not value.startswith(("rtsp://", "http://", "https://")):
+        name, value = value.split("=", 1)
+    source = int(value) if value.isdigit() else value
+    return (name, source) if name else source
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run age/gender inference over several cameras with a shared worker pool")
+    parser.add_argument("sources", nargs="+", help="Camera indexes, video files or URLs, optionally as name=source")
+    parser.add_argument("--workers", type=int, default=2, help="Inference threads, each with its own networks")
+    parser.add_argument("--queue-size", type=int, default=2, help="Frames buffered per camera before the oldest is dropped")
+    parser.add_argument("--stats-every", type=float, default=5.0, help="Seconds between stats reports")
+    args = parser.parse_args()
+
+    pipeline = MultiCameraPipeline([parse_source(source) for source in args.sources], args.workers, args.queue_size)
+    pipeline.start()
+    try:
+        while not pipeline.is_finished():
+            time.sleep(args.stats_every)
+            for name, stats in pipeline.stats().items():
+                print(f"{name}: capture {stats['capture_fps']:.1f} fps, inference {stats['inference_fps']:.1f} fps, "
+                      f"latency {stats['latency_ms']:.0f} ms (p95 {stats['latency_p95_ms']:.0f} ms), "
+                      f"queue {stats['queue']}, dropped {stats['dropped']}, errors {stats['errors']}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pipeline.stop()
+
+
+if __name__ == "__main__":
+    main()
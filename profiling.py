@@ -0,0 +1,123 @@
+import json
+import threading
+import time
+from collections import Counter, deque
+from contextlib import nullcontext
+
+
+def percentile(values, fraction):
+    # values must be sorted
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class StageTimer:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.record(self.name, (time.perf_counter() - self.start) * 1000)
+        return False
+
+
+class Profiler:
+    # Rolling per-stage timings in ms and event counters, shared by every thread of the process
+    def __init__(self, window=300, enabled=True):
+        self.window = window
+        self.enabled = enabled
+        self.timings = {}
+        self.totals = Counter()
+        self.counters = Counter()
+        self.lock = threading.Lock()
+
+    def stage(self, name):
+        # with profiler.stage("detect"): ...
+        if not self.enabled:
+            return nullcontext()
+        return StageTimer(self, name)
+
+    def record(self, name, elapsed_ms):
+        with self.lock:
+            timings = self.timings.get(name)
+            if timings is None:
+                timings = self.timings[name] = deque(maxlen=self.window)
+            timings.append(elapsed_ms)
+            self.totals[name] += 1
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def summary(self):
+        with self.lock:
+            timings = {name: sorted(values) for name, values in self.timings.items() if values}
+            totals = dict(self.totals)
+            counters = dict(self.counters)
+        stages = {name: {"p50": percentile(values, 0.50), "p95": percentile(values, 0.95),
+                         "p99": percentile(values, 0.99), "count": totals[name]}
+                  for name, values in timings.items()}
+        return {"stages": stages, "counters": counters}
+
+    def reset(self):
+        with self.lock:
+            self.timings.clear()
+            self.totals.clear()
+            self.counters.clear()
+
+
+def format_summary(summary, order=None):
+    # One line per stage for the on-screen overlay
+    stages = summary["stages"]
+    names = [name for name in order if name in stages] if order else sorted(stages)
+    lines = [f"{name:<10} p50 {stages[name]['p50']:6.1f}  p95 {stages[name]['p95']:6.1f}  p99 {stages[name]['p99']:6.1f} ms"
+             for name in names]
+    lines += [f"{name}: {value}" for name, value in sorted(summary["counters"].items())]
+    return lines
+
+
+class MetricsDumper:
+    # Appends one JSON line from collect() to path every interval seconds, e.g. on unattended kiosks
+    def __init__(self, collect, path="metrics.jsonl", interval=10.0):
+        self.collect = collect
+        self.path = path
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="metrics-dump", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.dump()
+
+    def dump(self):
+        record = {"time": time.strftime("%Y-%m-%d %H:%M:%S")}
+        record.update(self.collect())
+        try:
+            with open(self.path, "a") as metrics_file:
+                metrics_file.write(json.dumps(record) + "\n")
+        except OSError as error:
+            print(f"Metrics dump failed: {error}")
+
+    def close(self):
+        # Stop the thread and write one final record
+        if self.stopped.is_set():
+            return
+        self.stopped.set()
+        self.thread.join()
+        self.dump()
+
+
+_profiler = None
+_profiler_lock = threading.Lock()
+
+
+def get_profiler():
+    global _profiler
+    with _profiler_lock:
+        if _profiler is None:
+            _profiler = Profiler()
+        return _profiler
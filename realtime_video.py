@@ -1,15 +1,40 @@
 import tkinter as tk
+from tkinter import ttk
 from PIL import Image, ImageTk
 import cv2
-import os
-import json
-from datetime import datetime, timedelta
+import numpy as np
+from engine import get_engine, shutdown_engine
+from inference import detector_profiles
+from profiling import get_profiler, format_summary
+
+# Stage order for the performance overlay
+overlay_stages = ("read", "detect", "classify", "analyze", "capture", "write", "photo")
+
+
+class FrameView:
+    # One canvas image item and one PhotoImage, updated in place for every frame.
+    # Creating a new item per frame leaks canvas items and slows Tk down over time.
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.image_item = canvas.create_image(0, 0, anchor=tk.NW)
+        self.photo = None
+        self.rgb = None  # Reused BGR -> RGB conversion buffer
+
+    def show(self, frame):
+        if self.rgb is None or self.rgb.shape != frame.shape:
+            self.rgb = np.empty_like(frame)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self.rgb)
+        image = Image.fromarray(self.rgb)
+
+        if self.photo is None or (self.photo.width(), self.photo.height()) != image.size:
+            # New buffer only on the first frame or when the camera resolution changes
+            self.photo = ImageTk.PhotoImage(image=image)
+            self.canvas.itemconfig(self.image_item, image=self.photo)
+        else:
+            # paste() copies the pixels into the existing Tk photo; rgb can be reused right away
+            self.photo.paste(image)
 
 class RealtimeVideoTab(tk.Frame):
-    # Initialize last_capture_time and capture_interval at the class level
-    last_capture_time = datetime.now()
-    capture_interval = 10
-
     def __init__(self, master, *args, **kwargs):
         super().__init__(master, *args, **kwargs)
         tk.Label(self, text="Live Video Capture", font=("Arial", 14), background="#FFFFFF").pack(pady=20)
@@ -17,12 +42,36 @@ class RealtimeVideoTab(tk.Frame):
         # Create a canvas for displaying video
         self.canvas = tk.Canvas(self, width=640, height=480)
         self.canvas.pack()
+        self.frame_view = FrameView(self.canvas)
+
+        # Detector speed/accuracy profile, switchable while the video runs
+        profile_frame = tk.Frame(self, bg="white")
+        profile_frame.pack(pady=5)
+        tk.Label(profile_frame, text="Detector Profile:", bg="white").pack(side=tk.LEFT, padx=5)
+        self.profile_var = tk.StringVar(value=get_engine().analyzer.profile)
+        profile_dropdown = ttk.Combobox(profile_frame, textvariable=self.profile_var, values=list(detector_profiles), state="readonly")
+        profile_dropdown.pack(side=tk.LEFT)
+        profile_dropdown.bind("<<ComboboxSelected>>", lambda event: get_engine().set_profile(self.profile_var.get()))
+
+        # Stage timings drawn over the video
+        self.overlay_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(profile_frame, text="Performance overlay", variable=self.overlay_var, bg="white",
+                       command=self.update_overlay).pack(side=tk.LEFT, padx=10)
+        self.profiler = get_profiler()
+        self.frames_rendered = 0
+
+        # Per-stage FPS and queue depth of the video pipeline
+        self.stats_label = tk.Label(self, text="", font=("Arial", 10), bg="white", fg="gray")
+        self.stats_label.pack(pady=5)
 
         # Create a label for the notification with an initial text of "Initializing..."
         self.notification_label = tk.Label(self, text="Initializing...", font=("Arial", 13), bg="#048a01", fg="white", padx=17, pady=10)
         self.notification_label.place(relx=0.5, rely=0.1, anchor='center')
         self.notification_label.place_forget()  # Hide the label immediately
 
+        # Stop polling the pipeline when the tab is destroyed; the engine keeps running
+        self.bind("<Destroy>", self.on_destroy)
+
         # Initialize video streaming
         self.start_video_stream()
 
@@ -50,171 +99,61 @@ class RealtimeVideoTab(tk.Frame):
         if border_color:
             self.canvas.config(highlightbackground=border_color)
 
-    def face_box(self, face_net, frame):
-        frameWidth = frame.shape[1]
-        frameHeight = frame.shape[0]
-        blob = cv2.dnn.blobFromImage(frame, 1.0, (227, 227), [104, 117, 123], swapRB=False)
-        face_net.setInput(blob)
-        detection = face_net.forward()
-        bboxs = []
-        for i in range(detection.shape[2]):
-            confidence = detection[0, 0, i, 2]
-            if confidence > 0.7:
-                x1 = int(detection[0, 0, i, 3] * frameWidth)
-                y1 = int(detection[0, 0, i, 4] * frameHeight)
-                x2 = int(detection[0, 0, i, 5] * frameWidth)
-                y2 = int(detection[0, 0, i, 6] * frameHeight)
-                bboxs.append([x1, y1, x2, y2])
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 2)  # Set box color to red (BGR: 0, 0, 255)
-        return frame, bboxs
-
     def start_video_stream(self):
-        # Create the output folder if it doesn't exist
-        output_folder = "captured_images"
-        os.makedirs(output_folder, exist_ok=True)
-
-        faceProto = "opencv_face_detector.pbtxt"
-        faceModel = "opencv_face_detector_uint8.pb"
-
-        ageProto = "age_deploy.prototxt"
-        ageModel = "age_net.caffemodel"
-
-        genderProto = "gender_deploy.prototxt"
-        genderModel = "gender_net.caffemodel"
-
-        faceNet = cv2.dnn.readNet(faceModel, faceProto)
-        ageNet = cv2.dnn.readNet(ageModel, ageProto)
-        genderNet = cv2.dnn.readNet(genderModel, genderProto)
-
-        MODEL_MEAN_VALUES = (78.4263377603, 87.7689143744, 114.895847746)
-        ageList = ['11-15', '16-20', '21-25', '26-30', '31-35', '36-40', '41-45', '46-50', '51-55']
-        genderList = ['Male', 'Female']
-
-        video = cv2.VideoCapture(0)
-        padding = 20
-        line_margin = 5
-
-        def update_frame(genderNet, ageNet):
-            nonlocal video, faceNet
-
-            ret, frame = video.read()
-            frame = cv2.flip(frame, 1)  # Horizontal flip
-
-            # Detect faces
-            frame, bboxs = self.face_box(faceNet, frame)
-
-            # Check if faces are detected
-            if bboxs:
-                # Display the live video with labels
-                for bbox in bboxs:
-                    face = frame[max(0, bbox[1] - padding):min(bbox[3] + padding, frame.shape[0] - 1),
-                           max(0, bbox[0] - padding):min(bbox[2] + padding, frame.shape[1] - 1)]
-
-                    blob = cv2.dnn.blobFromImage(face, 1.0, (227, 227), MODEL_MEAN_VALUES, swapRB=False)
-                    genderNet.setInput(blob)
-                    genderPred = genderNet.forward()
-                    gender = genderList[genderPred[0].argmax()]
-
-                    ageNet.setInput(blob)
-                    agePred = ageNet.forward()
-                    age = ageList[agePred[0].argmax()]
-
-                    label_gender = "Gender: {}".format(gender)
-                    label_age = "Age: {}".format(age)
-
-                    text_size_gender = cv2.getTextSize(label_gender, cv2.FONT_HERSHEY_DUPLEX, 0.6, 1)[0]
-                    text_size_age = cv2.getTextSize(label_age, cv2.FONT_HERSHEY_DUPLEX, 0.6, 1)[0]
-
-                    cv2.putText(frame, label_gender, (bbox[0], bbox[3] + text_size_gender[1] + line_margin),
-                                cv2.FONT_HERSHEY_DUPLEX, 0.6, (255, 255, 255), 1, cv2.LINE_AA)
-                    cv2.putText(frame, label_age, (bbox[0], bbox[3] + text_size_gender[1] + text_size_age[1] + 2 * line_margin),
-                                cv2.FONT_HERSHEY_DUPLEX, 0.6, (255, 255, 255), 1, cv2.LINE_AA)
-
-                # Convert the frame to RGB format for display in tkinter
-                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                img = Image.fromarray(rgb_frame)
-                img = ImageTk.PhotoImage(image=img)
-
-                # Update the canvas with the new frame
-                self.canvas.create_image(0, 0, anchor=tk.NW, image=img)
-                self.canvas.image = img  # Keep a reference to prevent garbage collection
-
-                current_time = datetime.now()
-                time_difference = current_time - RealtimeVideoTab.last_capture_time
-                if time_difference.total_seconds() >= RealtimeVideoTab.capture_interval:
-                    # Save the image with a timestamp in the filename
-                    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-                    age_gender_timestamp = f"{age}_{gender}_{timestamp}"
-                    image_number = len(os.listdir(output_folder)) + 1
-                    image_filename = f"{age_gender_timestamp}_{image_number}.png"
-                    image_path = os.path.join(output_folder, image_filename)
-
-                    # Apply blur only inside the red facebox
-                    for bbox in bboxs:
-                        face = frame[max(0, bbox[1] - padding):min(bbox[3] + padding, frame.shape[0] - 1),
-                                max(0, bbox[0] - padding):min(bbox[2] + padding, frame.shape[1] - 1)]
-
-                        # Apply Gaussian blur to the face region
-                        blurred_face = cv2.GaussianBlur(face, (99, 99), 30)
-
-                        # Replace the face region with the blurred face in the saved image
-                        frame[max(0, bbox[1] - padding):min(bbox[3] + padding, frame.shape[0] - 1),
-                            max(0, bbox[0] - padding):min(bbox[2] + padding, frame.shape[1] - 1)] = blurred_face
-
-                        # Draw the red facebox and labels on the saved image
-                        cv2.rectangle(frame, (bbox[0], bbox[1]), (bbox[2], bbox[3]), (0, 0, 255), 2)
-                        cv2.putText(frame, label_gender, (bbox[0], bbox[3] + text_size_gender[1] + line_margin),
-                                    cv2.FONT_HERSHEY_DUPLEX, 0.6, (255, 255, 255), 1, cv2.LINE_AA)
-                        cv2.putText(frame, label_age, (bbox[0], bbox[3] + text_size_gender[1] + text_size_age[1] + 2 * line_margin),
-                                    cv2.FONT_HERSHEY_DUPLEX, 0.6, (255, 255, 255), 1, cv2.LINE_AA)
-
-                    # Save the image with blur applied
-                    cv2.imwrite(image_path, frame)
-                    print(f"Blurred Image captured and saved: {image_path}")
-
-                    # Log the data to log.json
-                    log_data = {
-                        "Date": current_time.strftime('%Y-%m-%d'),
-                        "Time": current_time.strftime('%H:%M:%S'),
-                        "Gender": gender,
-                        "Age": age,
-                        "Image Captured Filename": image_filename
-                    }
-
-                    log_json_path = "log.json"
-                    try:
-                        with open(log_json_path, 'r') as log_file:
-                            log_json = json.load(log_file)
-                    except json.decoder.JSONDecodeError:
-                        # Handle the case where the file is empty or improperly formatted
-                        log_json = []
-
-                    log_json.append(log_data)
-
-                    with open(log_json_path, 'w') as log_file:
-                        json.dump(log_json, log_file, indent=4)
-
-                    RealtimeVideoTab.last_capture_time = current_time
-                    # Show the notification label without fade-in and fade-out animation
-                    self.show_notification("Image captured successfully")
-
-            else:
-                # No faces detected, update the canvas without processing and displaying faces
-                img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-                img = ImageTk.PhotoImage(image=img)
-
-                # Update the canvas with the new frame
-                self.canvas.create_image(0, 0, anchor=tk.NW, image=img)
-                self.canvas.image = img  # Keep a reference to prevent garbage collection
-
-            # Call the update_frame function after 10 milliseconds
-            self.after(10, lambda: update_frame(genderNet, ageNet))
-
-        # Start the update_frame function
-        update_frame(genderNet, ageNet)
+        # Capture and inference run on the shared engine's threads; the Tk side only renders
+        self.pipeline = get_engine().start()
+        self.update_frame()
+
+    def update_frame(self):
+        result = self.pipeline.latest_frame()
+        if result is not None:
+            frame, faces = result
+
+            # Convert to RGB and update the canvas image in place
+            with self.profiler.stage("photo"):
+                self.frame_view.show(frame)
+
+            # Refresh the overlay text a few times a second rather than every frame
+            self.frames_rendered += 1
+            if self.frames_rendered % 10 == 0:
+                self.update_overlay()
+
+        for event, _ in self.pipeline.poll_events():
+            if event == "captured":
+                # Show the notification label without fade-in and fade-out animation
+                self.show_notification("Image captured successfully")
+
+        stats = self.pipeline.stats()
+        stats.setdefault("forward_passes_skipped", 0)
+        self.stats_label.config(
+            text="Capture {capture_fps:.1f} fps | Inference {inference_fps:.1f} fps | Render {render_fps:.1f} fps | "
+                 "Queue {frame_queue}/{result_queue} | Dropped {frames_dropped}/{results_dropped} | "
+                 "Skipped passes {forward_passes_skipped} | Writes {writes_pending} queued, {writes_dropped} dropped".format(**stats))
+
+        # Call the update_frame function after 10 milliseconds
+        self.after_id = self.after(10, self.update_frame)
+
+    def update_overlay(self):
+        self.canvas.delete("overlay")
+        if not self.overlay_var.get():
+            return
+        lines = format_summary(self.profiler.summary(), overlay_stages)
+        stats = self.pipeline.stats()
+        lines.append(f"dropped frames {stats['frames_dropped']} / results {stats['results_dropped']}")
+        self.canvas.create_rectangle(4, 4, 380, 10 + 15 * len(lines), fill="black", stipple="gray50", outline="",
+                                     tags="overlay")
+        self.canvas.create_text(10, 8, anchor=tk.NW, text="\n".join(lines), fill="#00FF00", font=("Courier", 9),
+                                tags="overlay")
+
+    def on_destroy(self, event):
+        if event.widget is not self:
+            return
+        if hasattr(self, "after_id"):
+            self.after_cancel(self.after_id)
 
 if __name__ == "__main__":
     root = tk.Tk()
     app = RealtimeVideoTab(root, bg="white")
     app.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
     root.mainloop()
+    shutdown_engine()
@@ -0,0 +1,100 @@
+import os
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageTk
+
+
+class ThumbnailCache:
+    # Thumbnails live on disk as small JPEGs; a bounded LRU keeps the PhotoImages for recently shown cards
+    def __init__(self, cache_folder=".thumbnails", size=(200, 200), quality=85, max_photos=200, workers=2):
+        self.cache_folder = cache_folder
+        self.size = size
+        self.quality = quality
+        self.max_photos = max_photos
+
+        self.photos = OrderedDict()
+        self.pending = set()
+        self.failed = set()
+        self.pending_lock = threading.Lock()
+        self.finished = deque(maxlen=1000)  # Bounded so it cannot grow while no tab is polling
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnail")
+
+        os.makedirs(self.cache_folder, exist_ok=True)
+
+    def thumbnail_path(self, image_path):
+        return os.path.join(self.cache_folder, os.path.splitext(os.path.basename(image_path))[0] + ".jpg")
+
+    def is_fresh(self, image_path):
+        thumbnail_path = self.thumbnail_path(image_path)
+        try:
+            return os.path.getmtime(thumbnail_path) >= os.path.getmtime(image_path)
+        except OSError:
+            return False
+
+    def generate(self, image_path):
+        # Runs on a worker thread: resize once and store the result on disk
+        try:
+            if not self.is_fresh(image_path):
+                with Image.open(image_path) as image:
+                    thumbnail = image.convert("RGB").resize(self.size)
+                temp_path = self.thumbnail_path(image_path) + ".tmp"
+                thumbnail.save(temp_path, "JPEG", quality=self.quality)
+                os.replace(temp_path, self.thumbnail_path(image_path))
+        except OSError as error:
+            self.failed.add(image_path)
+            print(f"Thumbnail failed for {image_path}: {error}")
+        finally:
+            with self.pending_lock:
+                self.pending.discard(image_path)
+            self.finished.append(image_path)
+
+    def schedule(self, image_path):
+        # Queue thumbnail generation in the background; safe to call from any thread
+        with self.pending_lock:
+            if image_path in self.pending:
+                return
+            self.pending.add(image_path)
+        self.executor.submit(self.generate, image_path)
+
+    def get_photo(self, image_path):
+        # Tk thread only: return a cached PhotoImage, or None while the thumbnail is still being made
+        if image_path in self.photos:
+            self.photos.move_to_end(image_path)
+            return self.photos[image_path]
+
+        if not self.is_fresh(image_path):
+            if image_path not in self.failed:
+                self.schedule(image_path)
+            return None
+
+        with Image.open(self.thumbnail_path(image_path)) as image:
+            photo = ImageTk.PhotoImage(image)
+        self.photos[image_path] = photo
+        if len(self.photos) > self.max_photos:
+            self.photos.popitem(last=False)
+        return photo
+
+    def completed(self):
+        # Image paths whose thumbnails finished since the last call
+        paths = []
+        while True:
+            try:
+                paths.append(self.finished.popleft())
+            except IndexError:
+                return paths
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+_thumbnail_cache = None
+_thumbnail_cache_lock = threading.Lock()
+
+
+def get_thumbnail_cache():
+    global _thumbnail_cache
+    with _thumbnail_cache_lock:
+        if _thumbnail_cache is None:
+            _thumbnail_cache = ThumbnailCache()
+        return _thumbnail_cache
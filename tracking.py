@@ -0,0 +1,129 @@
+import itertools
+from collections import Counter
+from inference import FrameAnalyzer, crop_windows, draw_boxes, draw_labels
+
+
+def iou(box_a, box_b):
+    x1, y1 = max(box_a[0], box_b[0]), max(box_a[1], box_b[1])
+    x2, y2 = min(box_a[2], box_b[2]), min(box_a[3], box_b[3])
+    intersection = max(0, x2 - x1) * max(0, y2 - y1)
+    area_a = max(0, box_a[2] - box_a[0]) * max(0, box_a[3] - box_a[1])
+    area_b = max(0, box_b[2] - box_b[0]) * max(0, box_b[3] - box_b[1])
+    union = area_a + area_b - intersection
+    return intersection / union if union else 0.0
+
+
+class Track:
+    def __init__(self, track_id, bbox, frame_index):
+        self.track_id = track_id
+        self.bbox = bbox
+        self.first_seen = frame_index
+        self.last_seen = frame_index
+        self.misses = 0
+        self.age_votes = Counter()
+        self.gender_votes = Counter()
+        self.classifications = 0
+        self.last_classified = None
+
+    def add_vote(self, age, gender, frame_index):
+        self.age_votes[age] += 1
+        self.gender_votes[gender] += 1
+        self.classifications += 1
+        self.last_classified = frame_index
+
+    def label(self):
+        # Majority vote over every classification of this track
+        if not self.classifications:
+            return None, None
+        return self.age_votes.most_common(1)[0][0], self.gender_votes.most_common(1)[0][0]
+
+
+class FaceTracker:
+    # Greedy IoU association of detections to tracks between detection rounds
+    def __init__(self, iou_threshold=0.3, max_misses=2, max_votes=3, reclassify_every=15):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.max_votes = max_votes
+        self.reclassify_every = reclassify_every
+        self.tracks = []
+        self.next_id = itertools.count(1)
+
+    def update(self, bboxs, frame_index):
+        pairs = sorted(((iou(track.bbox, bbox), t, b) for t, track in enumerate(self.tracks) for b, bbox in enumerate(bboxs)),
+                       reverse=True)
+        matched_tracks, matched_boxes = set(), set()
+        for overlap, t, b in pairs:
+            if overlap < self.iou_threshold:
+                break
+            if t in matched_tracks or b in matched_boxes:
+                continue
+            matched_tracks.add(t)
+            matched_boxes.add(b)
+            track = self.tracks[t]
+            track.bbox = bboxs[b]
+            track.last_seen = frame_index
+            track.misses = 0
+
+        live_tracks = []
+        for t, track in enumerate(self.tracks):
+            if t not in matched_tracks:
+                track.misses += 1
+            if track.misses <= self.max_misses:
+                live_tracks.append(track)
+
+        for b, bbox in enumerate(bboxs):
+            if b not in matched_boxes:
+                live_tracks.append(Track(next(self.next_id), bbox, frame_index))
+
+        self.tracks = live_tracks
+        return self.visible_tracks()
+
+    def visible_tracks(self):
+        # Tracks matched in the latest detection round
+        return [track for track in self.tracks if track.misses == 0]
+
+    def needs_classification(self, track, frame_index):
+        if track.classifications >= self.max_votes:
+            return False
+        return track.last_classified is None or frame_index - track.last_classified >= self.reclassify_every
+
+
+class TrackingAnalyzer(FrameAnalyzer):
+    # Runs the detector every detect_every frames and classifies each track only a few times
+    def __init__(self, faceNet=None, ageNet=None, genderNet=None, batched=True, profile="default", variant="caffe-fp32",
+                 detect_every=3, tracker=None):
+        super().__init__(faceNet, ageNet, genderNet, batched, profile, variant)
+        self.detect_every = detect_every
+        self.tracker = tracker or FaceTracker()
+        self.frame_index = 0
+        self.metrics = {"detections_run": 0, "detections_skipped": 0, "classifications_run": 0, "forward_passes_skipped": 0}
+
+    def analyze(self, frame):
+        self.frame_index += 1
+        if self.frame_index % self.detect_every == 1 or self.detect_every == 1 or not self.tracker.tracks:
+            frame, bboxs = self.detect(frame)
+            tracks = self.tracker.update(bboxs, self.frame_index)
+            self.metrics["detections_run"] += 1
+        else:
+            # Reuse the last detected boxes until the next detection round
+            tracks = self.tracker.visible_tracks()
+            draw_boxes(frame, [track.bbox for track in tracks])
+            self.metrics["detections_skipped"] += 1
+            self.metrics["forward_passes_skipped"] += 1
+
+        # Only tracks still collecting votes go through the age/gender networks
+        pending = [track for track in tracks if self.tracker.needs_classification(track, self.frame_index)]
+        windows = crop_windows([track.bbox for track in pending], frame.shape)
+        crops = [frame[y1:y2, x1:x2] for y1, y2, x1, x2 in windows]
+        for track, (age, gender) in zip(pending, self.classify(crops)):
+            track.add_vote(age, gender, self.frame_index)
+        self.metrics["classifications_run"] += len(pending)
+        self.metrics["forward_passes_skipped"] += 2 * (len(tracks) - len(pending))
+
+        faces = []
+        for track in tracks:
+            age, gender = track.label()
+            draw_labels(frame, track.bbox, age, gender)
+            faces.append({"bbox": track.bbox, "age": age, "gender": gender, "track_id": track.track_id,
+                          "votes": track.classifications})
+        return frame, faces
@@ -0,0 +1,176 @@
+import threading
+import time
+from collections import deque
+import cv2
+from profiling import get_profiler
+
+
+class DropOldestQueue:
+    # Bounded queue that discards the oldest item instead of blocking the producer
+    def __init__(self, maxsize=2):
+        self.maxsize = maxsize
+        self.items = deque()
+        self.dropped = 0
+        self.condition = threading.Condition()
+
+    def put(self, item):
+        with self.condition:
+            if len(self.items) >= self.maxsize:
+                self.items.popleft()
+                self.dropped += 1
+            self.items.append(item)
+            self.condition.notify()
+
+    def get(self, timeout=None):
+        with self.condition:
+            if not self.items:
+                self.condition.wait(timeout)
+            if not self.items:
+                return None
+            return self.items.popleft()
+
+    def get_latest(self):
+        # Take the newest item and discard anything older
+        with self.condition:
+            if not self.items:
+                return None
+            item = self.items.pop()
+            self.dropped += len(self.items)
+            self.items.clear()
+            return item
+
+    def qsize(self):
+        with self.condition:
+            return len(self.items)
+
+
+class StageStats:
+    # Rolling frames-per-second counter for one pipeline stage
+    def __init__(self, window=30):
+        self.timestamps = deque(maxlen=window)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def tick(self):
+        with self.lock:
+            self.timestamps.append(time.monotonic())
+            self.count += 1
+
+    def fps(self):
+        with self.lock:
+            if len(self.timestamps) < 2:
+                return 0.0
+            elapsed = self.timestamps[-1] - self.timestamps[0]
+            # Report zero once the stage has stalled for a second
+            if elapsed <= 0 or time.monotonic() - self.timestamps[-1] > 1.0:
+                return 0.0
+            return (len(self.timestamps) - 1) / elapsed
+
+
+class VideoPipeline:
+    # Capture thread -> inference worker -> render step, joined by drop-oldest queues
+    def __init__(self, analyzer, recorder=None, source=0, queue_size=2):
+        self.analyzer = analyzer
+        self.recorder = recorder
+        self.source = source
+
+        self.frame_queue = DropOldestQueue(queue_size)
+        self.result_queue = DropOldestQueue(queue_size)
+        self.events = DropOldestQueue(32)
+        self.listeners = []  # Called as listener(event, payload) from the inference thread; must not block
+
+        self.stage_stats = {"capture": StageStats(), "inference": StageStats(), "render": StageStats()}
+        self.profiler = get_profiler()
+        self.running = threading.Event()
+        self.threads = []
+        self.video = None
+
+    def start(self):
+        if self.running.is_set():
+            return
+        self.video = cv2.VideoCapture(self.source)
+        self.running.set()
+        self.threads = [
+            threading.Thread(target=self.capture_loop, name="capture", daemon=True),
+            threading.Thread(target=self.inference_loop, name="inference", daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        self.running.clear()
+        for thread in self.threads:
+            thread.join(timeout=2)
+        self.threads = []
+        if self.video is not None:
+            self.video.release()
+            self.video = None
+
+    def capture_loop(self):
+        while self.running.is_set():
+            with self.profiler.stage("read"):
+                ret, frame = self.video.read()
+            if not ret:
+                self.profiler.count("read_failures")
+                time.sleep(0.01)
+                continue
+            # Horizontal flip in place: read() hands out a fresh array per frame, and that array is
+            # what crosses to the inference thread, so there is no second buffer to allocate or share
+            self.frame_queue.put(cv2.flip(frame, 1, frame))
+            self.stage_stats["capture"].tick()
+
+    def inference_loop(self):
+        while self.running.is_set():
+            frame = self.frame_queue.get(timeout=0.1)
+            if frame is None:
+                continue
+            with self.profiler.stage("analyze"):
+                frame, faces = self.analyzer.analyze(frame)
+            self.result_queue.put((frame, faces))
+            self.stage_stats["inference"].tick()
+            self.notify("detections", faces)
+
+            if self.recorder is not None:
+                with self.profiler.stage("capture"):
+                    image_filename = self.recorder.maybe_capture(frame, faces)
+                if image_filename:
+                    self.events.put(("captured", image_filename))
+                    self.notify("captured", image_filename)
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def notify(self, event, payload):
+        for listener in self.listeners:
+            listener(event, payload)
+
+    def latest_frame(self):
+        # Render step: only the newest annotated frame is handed to the UI
+        result = self.result_queue.get_latest()
+        if result is not None:
+            self.stage_stats["render"].tick()
+        return result
+
+    def poll_events(self):
+        events = []
+        while True:
+            event = self.events.get(timeout=0)
+            if event is None:
+                return events
+            events.append(event)
+
+    def stats(self):
+        stats = {
+            "capture_fps": self.stage_stats["capture"].fps(),
+            "inference_fps": self.stage_stats["inference"].fps(),
+            "render_fps": self.stage_stats["render"].fps(),
+            "frame_queue": self.frame_queue.qsize(),
+            "result_queue": self.result_queue.qsize(),
+            "frames_dropped": self.frame_queue.dropped,
+            "results_dropped": self.result_queue.dropped,
+        }
+        # Analyzers that skip work (e.g. tracking) report what they saved
+        stats.update(getattr(self.analyzer, "metrics", {}))
+        if self.recorder is not None:
+            stats.update({f"writes_{name}": value for name, value in self.recorder.stats().items()})
+        return stats